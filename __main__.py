@@ -1,11 +1,19 @@
 import argparse
-from typing import Optional, Callable, Any
+import os
+import sys
+from dataclasses import asdict
+from timeit import default_timer as timer
+from typing import Optional
 
 from grammar import grammar_filter
-from language_model import LanguageModel
-from palindrome import PalindromeGenerator
+from palindrome import PalindromeGenerator, Checkpoint, Constraints, Progress
+from sorting import get_sort_key, is_scoring_criterion, sort_by_score
 from timing import Timing
-from words import pu_words, ku_suli_words, ku_lili_words
+from tpal import is_tpal_file_name, write_tpal
+from words import get_word_list
+
+DEFAULT_CHECKPOINT_INTERVAL = 60.0
+PROGRESS_BAR_WIDTH = 40
 
 
 def generate_palindromes(
@@ -13,31 +21,62 @@ def generate_palindromes(
         words: str,
         check_grammar: bool,
         sort_criterion: str,
-        file_name: Optional[str] = None):
+        file_name: Optional[str] = None,
+        constraints: Optional[Constraints] = None,
+        added_words: Optional[list[str]] = None,
+        deadline: Optional[float] = None,
+        max_results: Optional[int] = None,
+        show_progress: bool = False,
+        engine: str = 'stack'):
     if file_name:
         print(f'Generating palindromes with <= {max_word_count} words...')
 
-    word_list = get_word_list(words)
+    word_list = get_word_list(words) + (added_words or [])
 
     timing = Timing()
 
     generator = PalindromeGenerator(word_list)
     timing.mark('graph')
 
-    palindromes = generator.generate(max_word_count)
+    complete = True
+    if engine == 'vector':
+        palindromes = generator.generate_vectorized(max_word_count, constraints)
+    elif deadline is None and max_results is None and not show_progress:
+        palindromes = generator.generate(max_word_count, constraints)
+    else:
+        result = generator.generate_anytime(
+            max_word_count, constraints, deadline, max_results,
+            print_progress if show_progress else None)
+        if show_progress:
+            print(file=sys.stderr)
+        palindromes = result.palindromes
+        complete = result.complete
     timing.mark('generation')
 
-    if check_grammar:
+    if not complete:
+        print('Generation stopped before the search was done, '
+              'some palindromes are missing', file=sys.stderr)
+
+    scoring = bool(sort_criterion) and is_scoring_criterion(sort_criterion.lower())
+
+    if check_grammar and not scoring:
         palindromes = grammar_filter(palindromes)
         timing.mark('grammar')
 
-    if sort_criterion:
+    scores: Optional[list[float]] = None
+    if scoring:
+        # the grammar is checked by the same workers
+        scored = sort_by_score(palindromes, check_grammar)
+        scores = [score for score, _ in scored]
+        palindromes = [palindrome for _, palindrome in scored]
+        timing.mark('grammar, sorting' if check_grammar else 'sorting')
+    elif sort_criterion:
         sort_key = get_sort_key(sort_criterion.lower())
         palindromes.sort(key=sort_key)
         timing.mark('sorting')
 
     if file_name:
-        write_to_file(file_name, palindromes)
+        write_to_file(file_name, palindromes, scores, word_list)
     else:
         write_to_stdout(palindromes)
     timing.mark('output')
@@ -48,30 +87,141 @@ def generate_palindromes(
         print(timing)
 
 
-def get_word_list(value: str) -> list[str]:
-    match value:
-        case 'p' | 'pu':
-            return pu_words
-        case 's' | 'ku-suli':
-            return pu_words + ku_suli_words
-        case 'l' | 'ku-lili':
-            return pu_words + ku_suli_words + ku_lili_words
-        case _:
-            raise ValueError(f'invalid word list')
-
-
-def get_sort_key(value: str) -> Callable[[str], Any]:
-    match value:
-        case 'a' | 'alphabetical':
-            return lambda s: s
-        case 'l' | 'length':
-            return lambda s: (len(s), s)
-        case 'w' | 'word-count':
-            return lambda s: (s.count(' '), s)
-        case 'lm' | 'language-model':
-            return LanguageModel().score_sentence
-        case _:
-            raise ValueError('invalid sorting criterion')
+def generate_palindromes_with_checkpoints(
+        max_word_count: int,
+        words: str,
+        check_grammar: bool,
+        sort_criterion: str,
+        file_name: str,
+        checkpoint_file_name: str,
+        checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+        resume: bool = False,
+        constraints: Optional[Constraints] = None,
+        added_words: Optional[list[str]] = None):
+    """ Generates palindromes writing them to `file_name` as they are found.
+        The progress is saved to `checkpoint_file_name`
+        every `checkpoint_interval` seconds.
+        If `resume` is set, the generation continues from the saved checkpoint.
+        The output is sorted only after a final checkpoint is saved,
+        and the sorted output replaces it atomically,
+        so a crash while sorting can be resumed too.
+    """
+    parameters = {
+        'max_word_count': max_word_count,
+        'words': words,
+        'added_words': added_words or [],
+        'grammar': check_grammar,
+        'sort': sort_criterion,
+        # tuples are saved as lists, so they are compared as lists
+        'constraints': {
+            key: list(value) if isinstance(value, tuple) else value
+            for key, value in asdict(constraints or Constraints()).items()
+        },
+    }
+
+    if resume:
+        print(f'Resuming generation of palindromes with <= {max_word_count} words...')
+        checkpoint = Checkpoint.load(checkpoint_file_name)
+        if checkpoint.parameters != parameters:
+            raise ValueError('checkpoint parameters do not match')
+        file = open(file_name, 'r+', encoding='utf-8')
+        file.truncate(checkpoint.output_size)
+        file.seek(checkpoint.output_size)
+    else:
+        print(f'Generating palindromes with <= {max_word_count} words...')
+        checkpoint = Checkpoint(parameters)
+        file = open(file_name, 'w', encoding='utf-8')
+
+    word_list = get_word_list(words) + (added_words or [])
+
+    timing = Timing()
+
+    generator = PalindromeGenerator(word_list)
+    timing.mark('graph')
+
+    with file:
+        if not checkpoint.finished:
+            checkpoint.save(checkpoint_file_name)
+            last_saved = timer()
+            batches = generator.generate_resumable(max_word_count, checkpoint,
+                                                   constraints=constraints)
+            for palindromes in batches:
+                if check_grammar:
+                    palindromes = grammar_filter(palindromes)
+                for palindrome in palindromes:
+                    file.write(f'{palindrome}\n')
+
+                if timer() - last_saved >= checkpoint_interval:
+                    save_checkpoint(checkpoint, checkpoint_file_name, file)
+                    last_saved = timer()
+
+            checkpoint.finished = True
+            save_checkpoint(checkpoint, checkpoint_file_name, file)
+    timing.mark('generation')
+
+    if sort_criterion:
+        with open(file_name, 'r', encoding='utf-8') as file:
+            palindromes = file.read().splitlines()
+        if is_scoring_criterion(sort_criterion.lower()):
+            palindromes = [p for _, p in sort_by_score(palindromes)]
+        else:
+            sort_key = get_sort_key(sort_criterion.lower())
+            palindromes.sort(key=sort_key)
+        # the unsorted output is kept until the sorted one is complete
+        temp_file_name = f'{file_name}.tmp'
+        write_to_file(temp_file_name, palindromes)
+        os.replace(temp_file_name, file_name)
+        timing.mark('sorting')
+
+    if os.path.exists(checkpoint_file_name):
+        os.remove(checkpoint_file_name)
+
+    with open(file_name, 'r', encoding='utf-8') as file:
+        palindrome_count = sum(1 for _ in file)
+    print(f'Palindrome count: {palindrome_count}')
+    print('Elapsed time:')
+    print(timing)
+
+
+def save_checkpoint(checkpoint: Checkpoint, checkpoint_file_name: str, file):
+    """ Saves the checkpoint along with the size of the output
+        flushed to disk so far.
+    """
+    file.flush()
+    os.fsync(file.fileno())
+    checkpoint.output_size = file.tell()
+    checkpoint.save(checkpoint_file_name)
+
+
+def get_added_words(args: argparse.Namespace) -> list[str]:
+    """ Returns the words from `--add` missing from the chosen word list.
+    """
+    word_list = get_word_list(args.words)
+    return [word for word in dict.fromkeys(args.add or ())
+            if word not in word_list]
+
+
+def get_constraints(
+        args: argparse.Namespace,
+        added_words: list[str]
+) -> Constraints:
+    return Constraints(
+        required_words=tuple(args.contains or ()),
+        any_of_words=tuple(added_words) if args.only_new else (),
+        forbidden_words=tuple(args.exclude or ()),
+        prefix=tuple(args.starts_with.split()) if args.starts_with else (),
+        suffix=tuple(args.ends_with.split()) if args.ends_with else (),
+        max_length=args.max_length,
+    )
+
+
+def print_progress(progress: Progress):
+    filled = round(progress.fraction * PROGRESS_BAR_WIDTH)
+    bar = '#' * filled + '.' * (PROGRESS_BAR_WIDTH - filled)
+    print(f'\r[{bar}] {progress.fraction:6.1%}'
+          f' start edges: {progress.finished_start_edge_count}/{progress.start_edge_count}'
+          f' palindromes: {progress.palindrome_count}',
+          end='', file=sys.stderr, flush=True)
 
 
 def write_to_stdout(palindromes: list[str]):
@@ -79,7 +229,15 @@ def write_to_stdout(palindromes: list[str]):
         print(palindrome)
 
 
-def write_to_file(file_name: str, palindromes: list[str]):
+def write_to_file(
+        file_name: str,
+        palindromes: list[str],
+        scores: Optional[list[float]] = None,
+        word_list: Optional[list[str]] = None):
+    if is_tpal_file_name(file_name):
+        write_tpal(file_name, palindromes, scores, word_list)
+        return
+
     with open(file_name, 'w', encoding='utf-8') as file:
         for palindrome in palindromes:
             file.write(f'{palindrome}\n')
@@ -91,14 +249,66 @@ if __name__ == '__main__':
     parser.add_argument('max_word_count', type=int, help='max word count')
     parser.add_argument('-w', '--words', default='pu', type=str,
                         help='word list: pu (default), ku-suli, ku-lili')
+    parser.add_argument('-a', '--add', type=str, action='append', metavar='WORD',
+                        help='add the word to the word list (can be repeated)')
+    parser.add_argument('-n', '--only-new', action='store_true',
+                        help='generate only palindromes containing the added words')
     parser.add_argument('-g', '--grammar', action='store_true',
                         help='check grammar')
     parser.add_argument('-s', '--sort', type=str,
                         help='result sorting: A (alphabetical), L (length), W (word-count), or LM (language-model)')
     parser.add_argument('-o', '--output', type=str,
-                        help='output file (stdout if not specified)')
+                        help='output file (stdout if not specified), '
+                             'binary if the extension is .tpal')
+    parser.add_argument('--contains', type=str, action='append', metavar='WORD',
+                        help='generate only palindromes containing the word (can be repeated)')
+    parser.add_argument('--exclude', type=str, action='append', metavar='WORD',
+                        help='generate only palindromes without the word (can be repeated)')
+    parser.add_argument('--starts-with', type=str, metavar='WORDS',
+                        help='generate only palindromes starting with the words')
+    parser.add_argument('--ends-with', type=str, metavar='WORDS',
+                        help='generate only palindromes ending with the words')
+    parser.add_argument('--max-length', type=int,
+                        help='max palindrome length in characters')
+    parser.add_argument('-d', '--deadline', type=float, metavar='SECONDS',
+                        help='stop generation after the time limit')
+    parser.add_argument('-m', '--max-results', type=int,
+                        help='stop generation after finding the number of palindromes')
+    parser.add_argument('-p', '--progress', action='store_true',
+                        help='show a progress bar')
+    parser.add_argument('-e', '--engine', default='stack', choices=['stack', 'vector'],
+                        help='generation engine: stack (default) or vector (requires numpy)')
+    parser.add_argument('-c', '--checkpoint', type=str,
+                        help='checkpoint file to save the progress to (requires -o)')
+    parser.add_argument('--checkpoint-interval', type=float,
+                        default=DEFAULT_CHECKPOINT_INTERVAL,
+                        help=f'seconds between checkpoints (default {DEFAULT_CHECKPOINT_INTERVAL:g})')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue from the checkpoint')
 
     args = parser.parse_args()
+    if args.engine == 'vector' and (args.deadline is not None or args.max_results is not None
+                                    or args.progress or args.checkpoint or args.resume):
+        parser.error('deadlines, progress, and checkpoints require the stack engine')
+    added_words = get_added_words(args)
+    if args.only_new and not added_words:
+        parser.error('--only-new requires new words to be added with --add')
+    constraints = get_constraints(args, added_words)
 
-    generate_palindromes(args.max_word_count, args.words, args.grammar,
-                         args.sort, args.output)
+    if args.checkpoint or args.resume:
+        if args.deadline is not None or args.max_results is not None or args.progress:
+            parser.error('deadlines, max results, and progress are not supported with checkpoints')
+        if not args.output:
+            parser.error('checkpointing requires an output file')
+        if is_tpal_file_name(args.output):
+            parser.error('checkpointing requires a text output file')
+        checkpoint_file_name = args.checkpoint or f'{args.output}.checkpoint'
+        generate_palindromes_with_checkpoints(
+            args.max_word_count, args.words, args.grammar, args.sort,
+            args.output, checkpoint_file_name, args.checkpoint_interval,
+            args.resume, constraints, added_words)
+    else:
+        generate_palindromes(args.max_word_count, args.words, args.grammar,
+                             args.sort, args.output, constraints, added_words,
+                             args.deadline, args.max_results, args.progress,
+                             args.engine)
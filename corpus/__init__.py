@@ -1,7 +1,20 @@
-from typing import Iterable
-from os import listdir
-from os.path import isfile, join
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import os
+import pickle
 import re
+from array import array
+from dataclasses import dataclass
+from os import listdir
+from os.path import isfile, join, abspath, basename, dirname
+from typing import Iterable, Iterator
+
+CACHE_DIRECTORY = join(dirname(abspath(__file__)), '.cache')
+CACHE_VERSION = 1
+MIN_SIZE_FOR_MULTIPROCESSING = 1 << 20
+
 
 def get_valid_sentences():
     return get_corpus('corpus/toki_pona')
@@ -11,9 +24,165 @@ def get_invalid_sentences():
     return get_corpus('corpus/toki_ike')
 
 
+def get_valid_corpus() -> Corpus:
+    return load_corpus('corpus/toki_pona')
+
+
 def get_corpus(path: str) -> Iterable[str]:
-    for file_path in get_files(path):
-        yield from get_sentences(file_path)
+    return iter(load_corpus(path))
+
+
+@dataclass
+class Corpus:
+    """ Tokenized sentences packed as word ids.
+        Words of the `i`-th sentence are `vocabulary[word_id]` for word ids in
+        `word_ids[offsets[i]:offsets[i + 1]]`.
+    """
+    vocabulary: list[str]
+    word_ids: array
+    offsets: array
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __iter__(self) -> Iterator[str]:
+        return (' '.join(words) for words in self.get_sentence_words())
+
+    def get_sentence_ids(self) -> Iterator[array]:
+        word_ids = self.word_ids
+        offsets = self.offsets
+        return (word_ids[offsets[i]:offsets[i + 1]] for i in range(len(self)))
+
+    def get_sentence_words(self) -> Iterator[list[str]]:
+        vocabulary = self.vocabulary
+        return ([vocabulary[word_id] for word_id in ids]
+                for ids in self.get_sentence_ids())
+
+    @staticmethod
+    def merge(corpora: Iterable[Corpus]) -> Corpus:
+        vocabulary: dict[str, int] = {}
+        word_ids = array('I')
+        offsets = array('I', [0])
+        for corpus in corpora:
+            id_map = array('I', (vocabulary.setdefault(word, len(vocabulary))
+                                 for word in corpus.vocabulary))
+            base = len(word_ids)
+            word_ids.extend(id_map[word_id] for word_id in corpus.word_ids)
+            offsets.extend(base + offset for offset in corpus.offsets[1:])
+        return Corpus(list(vocabulary), word_ids, offsets)
+
+
+@dataclass
+class CacheEntry:
+    """ Tokenized file along with the data to check if the file has changed.
+    """
+    modification_time: int
+    size: int
+    digest: str
+    corpus: Corpus
+
+
+def load_corpus(path: str, cache_directory: str = CACHE_DIRECTORY) -> Corpus:
+    """ Loads all the files from the `path` directory as a single corpus.
+        Tokenized files are cached in `cache_directory`.
+        A file is tokenized again only if both its modification time (or size)
+        and its hash have changed. Large amounts of files to tokenize
+        are processed in parallel.
+    """
+    cache_file_name = join(cache_directory, get_cache_name(path))
+    cache = read_cache(cache_file_name)
+
+    entries: dict[str, CacheEntry] = {}
+    changed: list[tuple[str, os.stat_result, str]] = []
+    for file_path in sorted(get_files(path)):
+        name = basename(file_path)
+        stat = os.stat(file_path)
+        entry = cache.get(name)
+        if (entry is not None and entry.modification_time == stat.st_mtime_ns
+                and entry.size == stat.st_size):
+            entries[name] = entry
+            continue
+
+        digest = get_digest(file_path)
+        if entry is not None and entry.digest == digest:
+            entries[name] = CacheEntry(stat.st_mtime_ns, stat.st_size,
+                                       digest, entry.corpus)
+        else:
+            changed.append((file_path, stat, digest))
+
+    if changed:
+        file_paths = [file_path for file_path, _, _ in changed]
+        if sum(stat.st_size for _, stat, _ in changed) < MIN_SIZE_FOR_MULTIPROCESSING:
+            # single process
+            corpora = list(map(tokenize_file, file_paths))
+        else:
+            # multiprocessing
+            with multiprocessing.Pool() as pool:
+                corpora = pool.map(tokenize_file, file_paths)
+
+        for (file_path, stat, digest), corpus in zip(changed, corpora):
+            entries[basename(file_path)] = CacheEntry(
+                stat.st_mtime_ns, stat.st_size, digest, corpus)
+
+    if entries != cache:
+        write_cache(cache_file_name, entries)
+
+    return Corpus.merge(entries[name].corpus for name in sorted(entries))
+
+
+def get_cache_name(path: str) -> str:
+    path_digest = hashlib.sha1(abspath(path).encode('utf-8')).hexdigest()[:12]
+    return f'{basename(abspath(path))}-{path_digest}.pickle'
+
+
+def read_cache(cache_file_name: str) -> dict[str, CacheEntry]:
+    try:
+        with open(cache_file_name, 'rb') as file:
+            version, entries = pickle.load(file)
+        return entries if version == get_cache_version() else {}
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError,
+            TypeError, AttributeError):
+        return {}
+
+
+def write_cache(cache_file_name: str, entries: dict[str, CacheEntry]):
+    """ Writes the cache atomically. The cache is optional,
+        so failing to write it is not an error.
+    """
+    try:
+        os.makedirs(dirname(cache_file_name), exist_ok=True)
+        temp_file_name = f'{cache_file_name}.{os.getpid()}.tmp'
+        with open(temp_file_name, 'wb') as file:
+            pickle.dump((get_cache_version(), entries), file)
+        os.replace(temp_file_name, cache_file_name)
+    except OSError:
+        pass
+
+
+def get_cache_version() -> tuple:
+    """ Tokenized files depend on the sentence splitting and normalization,
+        so changing them invalidates the cache.
+    """
+    return (CACHE_VERSION, sentence_end.pattern, non_word.pattern)
+
+
+def get_digest(file_path: str) -> str:
+    with open(file_path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def tokenize_file(file_path: str) -> Corpus:
+    """ Packs sentences of a file as word ids.
+        Can be executed in a separate process.
+    """
+    vocabulary: dict[str, int] = {}
+    word_ids = array('I')
+    offsets = array('I', [0])
+    for sentence in get_sentences(file_path):
+        word_ids.extend(vocabulary.setdefault(word, len(vocabulary))
+                        for word in sentence.split(' '))
+        offsets.append(len(word_ids))
+    return Corpus(list(vocabulary), word_ids, offsets)
 
 
 def get_files(path: str) -> Iterable[str]:
@@ -26,10 +195,10 @@ def get_sentences(file_path: str) -> Iterable[str]:
         for line in file:
             without_comment = line.split('#', 1)[0]
             for sentence in sentence_end.split(without_comment):
-                normalized = non_letter.sub(sentence, ' ').strip()
+                normalized = non_word.sub(' ', sentence).strip()
                 if normalized:
                     yield normalized
 
 
 sentence_end = re.compile(r'[.?!:"“”]')
-non_letter = re.compile(r'[^A-Za-z]+')
+non_word = re.compile(r'\W+')
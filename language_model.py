@@ -1,17 +1,21 @@
 import re
 import sys
+from functools import cache
 from typing import List
 
-from nltk.lm import Laplace
-from nltk.lm.preprocessing import padded_everygram_pipeline, pad_both_ends
-from nltk.util import everygrams
-
-from corpus import get_valid_sentences
+from corpus import get_valid_corpus
+from ngram import NgramModel
 
 
 class LanguageModel:
-    def __init__(self, ngram_order: int = 2):
+    """ N-gram language model trained on the valid sentence corpus.
+        `ngram_order` is the max n-gram length (orders up to 5 are practical),
+        `gamma` is the additive smoothing (1 is Laplace smoothing).
+    """
+
+    def __init__(self, ngram_order: int = 2, gamma: float = 1.0):
         self.ngram_order = ngram_order
+        self.gamma = gamma
         self.lm = self.get_lm_model()
 
     @staticmethod
@@ -25,20 +29,27 @@ class LanguageModel:
         tokens = ["PROPER_NOUN" if x[0].isupper() else x for x in tokens]
         return tokens
 
-    def get_lm_model(self) -> Laplace:
-        sents = [self.tokenize(sentence) for sentence in get_valid_sentences()]
-        train, vocab = padded_everygram_pipeline(self.ngram_order, sents)
-        train = [list(x) for x in train]
-        vocab = list(vocab)
-        lm = Laplace(2)
-        lm.fit(train, vocab)
-        return lm
+    def get_lm_model(self) -> NgramModel:
+        # The corpus is already split into words, so only proper nouns
+        # are to be replaced, once per vocabulary word
+        corpus = get_valid_corpus()
+        tokens = ["PROPER_NOUN" if x[0].isupper() else x for x in corpus.vocabulary]
+        sents = ([tokens[i] for i in ids] for ids in corpus.get_sentence_ids())
+        return NgramModel.train(sents, self.ngram_order, self.gamma)
 
     def score_sentence(self, sentence: str) -> float:
-        tokens = self.tokenize(sentence)
-        bigram_padded_tokens = everygrams(pad_both_ends(
-            tokens, n=self.ngram_order))
-        return self.lm.entropy(bigram_padded_tokens)
+        return self.lm.entropy(self.tokenize(sentence))
+
+    def score_sentences(self, sentences: List[str]) -> List[float]:
+        return self.lm.entropies(self.tokenize(sentence) for sentence in sentences)
+
+
+@cache
+def get_language_model() -> LanguageModel:
+    """ Returns the language model shared within the current process.
+        The model is trained on the first call.
+    """
+    return LanguageModel()
 
 
 def main():
@@ -0,0 +1,183 @@
+""" Compact n-gram counts with additive smoothing.
+
+    Words are mapped to ids, and an n-gram is packed into a single integer key
+    with `word_bits` bits per word. For every n-gram order,
+    the counts are kept in sorted arrays of keys and values,
+    and the totals of the contexts are kept the same way.
+"""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from math import log2
+from typing import Iterable, Optional
+
+UNKNOWN = '<UNK>'
+SENTENCE_START = '<s>'
+SENTENCE_END = '</s>'
+
+TRAINING_WORD_BITS = 24
+"""Bits per word in the keys used while training (up to 16M distinct words)."""
+
+
+class SortedCounts:
+    """ Integer keys with counts stored in sorted arrays.
+    """
+
+    def __init__(self, counts: dict[int, int]):
+        keys = sorted(counts)
+        self.keys = array('Q', keys)
+        self.counts = array('Q', (counts[key] for key in keys))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def get(self, key: int) -> int:
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.counts[i]
+        return 0
+
+
+class NgramModel:
+    """ N-gram language model with Lidstone smoothing
+        (Laplace smoothing if `gamma` is 1).
+        The probability of a word in a context is
+        `(count(context + word) + gamma) / (total(context) + gamma * V)`
+        where `total(context)` is the number of n-grams starting with the context,
+        and `V` is the vocabulary size including the unknown word.
+        Contexts longer than `order - 1` are never seen,
+        so the words in them have the probability `1 / V`.
+    """
+
+    def __init__(
+            self,
+            order: int,
+            vocabulary: list[str],
+            ngram_counts: list[SortedCounts],
+            context_totals: list[SortedCounts],
+            gamma: float = 1.0):
+        self.order = order
+        self.vocabulary = vocabulary
+        self.word_ids = {word: i for i, word in enumerate(vocabulary)}
+        self.word_bits = max(len(vocabulary) - 1, 1).bit_length()
+        self.ngram_counts = ngram_counts
+        self.context_totals = context_totals
+        self.gamma = gamma
+
+    @staticmethod
+    def train(
+            sentences: Iterable[list[str]],
+            order: int = 2,
+            gamma: float = 1.0
+    ) -> NgramModel:
+        """ Counts n-grams of orders from 1 to `order` in padded sentences.
+            Sentences are processed one by one, so the memory used
+            depends only on the number of distinct words and n-grams.
+        """
+        word_ids: dict[str, int] = {UNKNOWN: 0}
+        counts: list[dict[int, int]] = [defaultdict(int) for _ in range(order)]
+        mask = (1 << TRAINING_WORD_BITS * order) - 1
+
+        for sentence in sentences:
+            ids = [word_ids.setdefault(word, len(word_ids))
+                   for word in pad(sentence, order)]
+            # `key` is the packed n-gram of length `order` ending at `ids[i]`,
+            # its lower bits are the shorter n-grams ending there
+            key = 0
+            for i, word_id in enumerate(ids):
+                key = (key << TRAINING_WORD_BITS | word_id) & mask
+                for length in range(1, min(i + 1, order) + 1):
+                    counts[length - 1][
+                        key & (1 << TRAINING_WORD_BITS * length) - 1] += 1
+
+        if len(word_ids) >= 1 << TRAINING_WORD_BITS:
+            raise ValueError('too many distinct words')
+
+        vocabulary = list(word_ids)
+        word_bits = max(len(vocabulary) - 1, 1).bit_length()
+        if word_bits * order > 64:
+            raise ValueError('vocabulary is too large for the n-gram order')
+
+        ngram_counts = []
+        context_totals = []
+        for length, length_counts in enumerate(counts, 1):
+            repacked = {
+                repack(key, length, TRAINING_WORD_BITS, word_bits): count
+                for key, count in length_counts.items()
+            }
+            length_counts.clear()
+            totals: dict[int, int] = defaultdict(int)
+            for key, count in repacked.items():
+                totals[key >> word_bits] += count
+            ngram_counts.append(SortedCounts(repacked))
+            context_totals.append(SortedCounts(totals))
+
+        return NgramModel(order, vocabulary, ngram_counts, context_totals, gamma)
+
+    def log_score(
+            self,
+            ids: list[int],
+            cache: Optional[dict[tuple[int, int], float]] = None
+    ) -> float:
+        """ Returns log2 of the probability of the last word
+            given the previous ones as context.
+        """
+        length = len(ids)
+        if length > self.order:
+            return -log2(len(self.vocabulary))
+
+        key = 0
+        for word_id in ids:
+            key = key << self.word_bits | word_id
+        if cache is not None:
+            score = cache.get((length, key))
+            if score is not None:
+                return score
+
+        count = self.ngram_counts[length - 1].get(key)
+        total = self.context_totals[length - 1].get(key >> self.word_bits)
+        score = log2((count + self.gamma) /
+                     (total + self.gamma * len(self.vocabulary)))
+        if cache is not None:
+            cache[(length, key)] = score
+        return score
+
+    def entropy(
+            self,
+            sentence: list[str],
+            cache: Optional[dict[tuple[int, int], float]] = None
+    ) -> float:
+        """ Returns the cross-entropy of the padded sentence
+            averaged over all its n-grams of all lengths.
+        """
+        ids = [self.word_ids.get(word, 0) for word in pad(sentence, self.order)]
+        scores = [
+            self.log_score(ids[start:end], cache)
+            for start in range(len(ids))
+            for end in range(start + 1, len(ids) + 1)
+        ]
+        return -sum(scores) / len(scores)
+
+    def entropies(self, sentences: Iterable[list[str]]) -> list[float]:
+        """ Returns the entropies of sentences sharing the lookups
+            of the n-grams that occur in several sentences.
+        """
+        cache: dict[tuple[int, int], float] = {}
+        return [self.entropy(sentence, cache) for sentence in sentences]
+
+
+def pad(sentence: list[str], order: int) -> list[str]:
+    padding = order - 1
+    return [SENTENCE_START] * padding + sentence + [SENTENCE_END] * padding
+
+
+def repack(key: int, length: int, from_bits: int, to_bits: int) -> int:
+    """ Changes the number of bits per word in a packed n-gram.
+    """
+    from_mask = (1 << from_bits) - 1
+    repacked = 0
+    for i in range(length):
+        repacked |= (key >> from_bits * i & from_mask) << to_bits * i
+    return repacked
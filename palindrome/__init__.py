@@ -1,10 +1,18 @@
 import multiprocessing
-from dataclasses import dataclass
-from typing import Iterable, Tuple
+from dataclasses import dataclass, replace
+from timeit import default_timer as timer
+from typing import Callable, Generator, Iterable, Optional, Tuple
 
+from .checkpoint import Checkpoint
+from .constraints import Constraints, SearchConstraints, prepare_constraints
 from .graph import PalindromeGraph, Node, StartEdge, Edge
+from .progress import Progress, GenerationResult, SubtreeSizes
 
 MIN_WORD_COUNT_FOR_MULTIPROCESSING = 7
+CHECKPOINT_STEP_COUNT = 100_000
+ANYTIME_STEP_COUNT = 10_000
+
+StackItem = Tuple[Node, int, str, int]
 
 
 class PalindromeGenerator:
@@ -14,14 +22,19 @@ class PalindromeGenerator:
     def __init__(self, word_list: list[str]):
         self.graph = PalindromeGraph(word_list)
 
-    def generate(self, max_word_count: int) -> list[str]:
-        """ Returns a list of all possible palindromes with <= `max_word_count` words.
+    def generate(
+            self,
+            max_word_count: int,
+            constraints: Optional[Constraints] = None
+    ) -> list[str]:
+        """ Returns a list of all possible palindromes with <= `max_word_count` words
+            satisfying `constraints` if given.
         """
         # prepare data for processing
+        search_constraints = self.prepare_constraints(constraints)
         contexts = (
-            ProcessContext(start_edge, self.graph.edges_from_node,
-                           self.graph.distances, max_word_count)
-            for start_edge in self.graph.start_edges
+            self.get_context(start_edge, max_word_count, search_constraints)
+            for start_edge in self.get_start_edges(search_constraints)
         )
 
         # processing
@@ -38,6 +51,209 @@ class PalindromeGenerator:
 
         return palindromes
 
+    def generate_vectorized(
+            self,
+            max_word_count: int,
+            constraints: Optional[Constraints] = None
+    ) -> list[str]:
+        """ Returns the same palindromes as `generate` (in another order)
+            expanding whole frontiers per word count with NumPy
+            instead of one stack entry at a time.
+        """
+        from .vectorized import CsrGraph, generate_vectorized
+
+        search_constraints = self.prepare_constraints(constraints)
+        if search_constraints is None:
+            graph = CsrGraph(self.graph.start_edges, self.graph.edges_from_node,
+                             self.graph.distances)
+        else:
+            graph = CsrGraph(search_constraints.start_edges,
+                             search_constraints.edges_from_node,
+                             search_constraints.distances, search_constraints)
+        return generate_vectorized(graph, max_word_count)
+
+    def generate_new(
+            self,
+            max_word_count: int,
+            new_words: list[str],
+            constraints: Optional[Constraints] = None
+    ) -> list[str]:
+        """ Returns a list of palindromes with <= `max_word_count` words
+            containing at least one of `new_words`.
+            If the generator is created with an old word list extended by
+            `new_words`, these are exactly the palindromes missing from
+            the result for the old word list.
+            Only the paths that can still reach an edge with a new word
+            are searched.
+        """
+        if not new_words:
+            return []
+        constraints = replace(constraints or Constraints(),
+                              any_of_words=tuple(new_words))
+        return self.generate(max_word_count, constraints)
+
+    def generate_resumable(
+            self,
+            max_word_count: int,
+            checkpoint: Checkpoint,
+            step_count: int = CHECKPOINT_STEP_COUNT,
+            constraints: Optional[Constraints] = None
+    ) -> Iterable[list[str]]:
+        """ Yields palindromes with <= `max_word_count` words
+            satisfying `constraints` in batches.
+            Start edges marked as done in `checkpoint` are skipped,
+            and the saved stacks of the ones in progress are continued.
+            Before each batch is yielded, `checkpoint` is updated
+            so that it reflects the state right after the batch is consumed.
+        """
+        search_constraints = self.prepare_constraints(constraints)
+        batches = self.generate_batches(max_word_count, checkpoint,
+                                        step_count, search_constraints)
+        for _, palindromes in batches:
+            yield palindromes
+
+    def generate_anytime(
+            self,
+            max_word_count: int,
+            constraints: Optional[Constraints] = None,
+            deadline: Optional[float] = None,
+            max_results: Optional[int] = None,
+            on_progress: Optional[Callable[[Progress], None]] = None
+    ) -> GenerationResult:
+        """ Generates palindromes like `generate` but stops
+            after `deadline` seconds or when `max_results` palindromes are found,
+            returning the ones found so far.
+            `on_progress` is called every time a piece of the search is done.
+        """
+        end_time = None if deadline is None else timer() + deadline
+        search_constraints = self.prepare_constraints(constraints)
+        start_edges = self.get_start_edges(search_constraints)
+        contexts = [
+            self.get_context(start_edge, max_word_count, search_constraints)
+            for start_edge in start_edges
+        ]
+
+        # Work left for every start edge, estimated by subtree sizes
+        subtree_sizes = (
+            SubtreeSizes(self.graph.edges_from_node, self.graph.distances)
+            if search_constraints is None else
+            SubtreeSizes(search_constraints.edges_from_node,
+                         search_constraints.distances)
+        )
+        work_left = [
+            sum(subtree_sizes.get(node, words_left)
+                for node, words_left, _, _ in initial_stack(context))
+            for context in contexts
+        ]
+        progress = Progress(len(start_edges), 0, sum(work_left), 0, 0)
+
+        palindromes: list[str] = []
+        checkpoint = Checkpoint({})
+        batches = self.generate_batches(max_word_count, checkpoint,
+                                        ANYTIME_STEP_COUNT, search_constraints)
+        complete = True
+        for index, batch in batches:
+            palindromes.extend(batch)
+
+            stack = checkpoint.stacks.get(index, [])
+            new_work_left = sum(subtree_sizes.get(node, words_left)
+                                for node, words_left, _, _ in stack)
+            progress.done_work += work_left[index] - new_work_left
+            work_left[index] = new_work_left
+            progress.finished_start_edge_count = len(checkpoint.done)
+            progress.palindrome_count = len(palindromes)
+            if on_progress:
+                on_progress(progress)
+
+            if max_results is not None and len(palindromes) >= max_results:
+                complete = (len(checkpoint.done) == len(start_edges)
+                            and len(palindromes) == max_results)
+                del palindromes[max_results:]
+                progress.palindrome_count = len(palindromes)
+                break
+            if end_time is not None and timer() >= end_time:
+                complete = len(checkpoint.done) == len(start_edges)
+                break
+        batches.close()
+
+        return GenerationResult(palindromes, complete, progress)
+
+    def generate_batches(
+            self,
+            max_word_count: int,
+            checkpoint: Checkpoint,
+            step_count: int,
+            search_constraints: Optional[SearchConstraints]
+    ) -> Generator[Tuple[int, list[str]], None, None]:
+        """ Yields batches of palindromes along with the indices
+            of the start edges they are found from.
+            See `generate_resumable`.
+        """
+        start_edges = self.get_start_edges(search_constraints)
+        stacks: dict[int, list[StackItem]] = {
+            index: checkpoint.stacks.get(index) or initial_stack(
+                self.get_context(start_edge, max_word_count, search_constraints))
+            for index, start_edge in enumerate(start_edges)
+            if index not in checkpoint.done
+        }
+
+        pool = (multiprocessing.Pool()
+                if max_word_count >= MIN_WORD_COUNT_FOR_MULTIPROCESSING
+                else None)
+        try:
+            while stacks:
+                tasks = [
+                    SearchTask(index,
+                               self.get_context(start_edges[index],
+                                                max_word_count,
+                                                search_constraints),
+                               stack, step_count)
+                    for index, stack in stacks.items()
+                ]
+                results = (pool.imap_unordered(run_search_task, tasks)
+                           if pool else map(run_search_task, tasks))
+
+                for index, palindromes, stack in results:
+                    if stack:
+                        stacks[index] = checkpoint.stacks[index] = stack
+                    else:
+                        del stacks[index]
+                        checkpoint.stacks.pop(index, None)
+                        checkpoint.done.add(index)
+                    yield (index, palindromes)
+        finally:
+            if pool:
+                pool.terminate()
+
+    def prepare_constraints(
+            self,
+            constraints: Optional[Constraints]
+    ) -> Optional[SearchConstraints]:
+        if constraints is None or constraints == Constraints():
+            return None
+        return prepare_constraints(self.graph, constraints)
+
+    def get_start_edges(
+            self,
+            search_constraints: Optional[SearchConstraints]
+    ) -> list[StartEdge]:
+        if search_constraints is None:
+            return self.graph.start_edges
+        return search_constraints.start_edges
+
+    def get_context(
+            self,
+            start_edge: StartEdge,
+            max_word_count: int,
+            search_constraints: Optional[SearchConstraints] = None
+    ) -> 'ProcessContext':
+        if search_constraints is None:
+            return ProcessContext(start_edge, self.graph.edges_from_node,
+                                  self.graph.distances, max_word_count)
+        return ProcessContext(start_edge, search_constraints.edges_from_node,
+                              search_constraints.distances, max_word_count,
+                              search_constraints)
+
 
 @dataclass
 class ProcessContext:
@@ -48,23 +264,68 @@ class ProcessContext:
     edges_from_node: dict[Node, list[Edge]]
     distances: dict[Node, int]
     max_word_count: int
+    constraints: Optional[SearchConstraints] = None
+
+
+@dataclass
+class SearchTask:
+    """ A bounded piece of the search for a single start edge.
+        `stack` is the state the search continues from.
+    """
+    index: int
+    context: ProcessContext
+    stack: list[StackItem]
+    max_steps: Optional[int]
 
 
 def get_palindromes_by_start_edge(context: ProcessContext) -> list[str]:
     """ Gets a list of all palindromes starting with the given start node.
         Can be executed in a separate process.
     """
+    return search(context, initial_stack(context))
+
+
+def run_search_task(
+        task: SearchTask
+) -> Tuple[int, list[str], list[StackItem]]:
+    """ Runs the search for at most `task.max_steps` steps.
+        Returns the start edge index, the palindromes found,
+        and the stack left to continue from (empty if the search is finished).
+        Can be executed in a separate process.
+    """
+    palindromes = search(task.context, task.stack, task.max_steps)
+    return (task.index, palindromes, task.stack)
+
+
+def initial_stack(context: ProcessContext) -> list[StackItem]:
+    word = context.start_edge.word
+    found = (context.constraints.word_masks.get(word, 0)
+             if context.constraints else 0)
+    return [
+        (context.start_edge.to_node, context.max_word_count - 1, word, found)
+    ]
+
+
+def search(
+        context: ProcessContext,
+        stack: list[StackItem],
+        max_steps: Optional[int] = None
+) -> list[str]:
+    """ Pops at most `max_steps` entries from `stack` (or all if None)
+        and returns the palindromes found. `stack` is modified in place.
+    """
+    if context.constraints is not None:
+        return search_constrained(context, context.constraints, stack, max_steps)
+
     palindromes: list[str] = []
 
     # Palindromes are paths in the graph starting with a start edge
     # and ending with the final node.
-    # Find all such paths of length <= `max_word_count` from the given `statr_edge`
-    stack: list[Tuple[Node, int, str]] = [
-        (context.start_edge.to_node, context.max_word_count - 1,
-         context.start_edge.word)
-    ]
-    while len(stack) > 0:
-        (node, words_left, words) = stack.pop()
+    # Find all such paths of length <= `max_word_count` from the given `start_edge`
+    steps = 0
+    while len(stack) > 0 and (max_steps is None or steps < max_steps):
+        steps += 1
+        (node, words_left, words, _) = stack.pop()
         distance = context.distances.get(node)
 
         if distance is not None and distance <= words_left:
@@ -75,9 +336,65 @@ def get_palindromes_by_start_edge(context: ProcessContext) -> list[str]:
                     else:
                         new_words = f'{edge.word} {words}'
 
-                    stack.append((edge.to_node, words_left - 1, new_words))
+                    stack.append((edge.to_node, words_left - 1, new_words, 0))
 
             if distance == 0:
                 palindromes.append(words)
 
     return palindromes
+
+
+def search_constrained(
+        context: ProcessContext,
+        constraints: SearchConstraints,
+        stack: list[StackItem],
+        max_steps: Optional[int] = None
+) -> list[str]:
+    """ Same as `search` but prunes the paths that cannot satisfy `constraints`.
+        The last element of a stack entry is the bit mask of the required words
+        that are already present.
+    """
+    palindromes: list[str] = []
+
+    word_masks = constraints.word_masks
+    required_distances = list(enumerate(constraints.required_distances))
+    min_lengths = constraints.min_lengths
+    max_length = constraints.max_length
+
+    steps = 0
+    while len(stack) > 0 and (max_steps is None or steps < max_steps):
+        steps += 1
+        (node, words_left, words, found) = stack.pop()
+        distance = context.distances.get(node)
+
+        if distance is None or distance > words_left:
+            continue
+
+        # Can the missing required words still appear within the words left?
+        if found != constraints.full_mask and any(
+                required_distance.get(node, words_left + 1) > words_left
+                for i, required_distance in required_distances
+                if not found & (1 << i)):
+            continue
+
+        if min_lengths is not None and max_length is not None:
+            min_length = min_lengths.get(node)
+            if min_length is None or len(words) + min_length > max_length:
+                continue
+
+        if words_left > 0:
+            for edge in context.edges_from_node[node]:
+                if node.offset >= 0:
+                    new_words = f'{words} {edge.word}'
+                else:
+                    new_words = f'{edge.word} {words}'
+
+                stack.append((edge.to_node, words_left - 1, new_words,
+                              found | word_masks.get(edge.word, 0)))
+
+        if (distance == 0 and found == constraints.full_mask
+                and (max_length is None or len(words) <= max_length)
+                and constraints.is_acceptable(words)):
+            palindromes.append(words)
+
+    return palindromes
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any
+
+from .graph_elements import Node
+
+
+@dataclass
+class Checkpoint:
+    """ State of a long-running generation that can be saved and resumed.
+        `done` contains indices of finished start edges,
+        `stacks` contains search stacks of the start edges in progress,
+        `output_size` is the size of the output written so far.
+        `finished` is set when the generation is done and only
+        the post-processing of the output is left.
+        `parameters` are the generation parameters the state is valid for.
+    """
+    parameters: dict[str, Any]
+    done: set[int] = field(default_factory=set)
+    stacks: dict[int, list[tuple[Node, int, str, int]]] = field(default_factory=dict)
+    output_size: int = 0
+    finished: bool = False
+
+    def save(self, file_name: str):
+        """ Saves the checkpoint atomically, so a crash while saving
+            leaves the previous checkpoint intact.
+        """
+        data = {
+            'parameters': self.parameters,
+            'done': sorted(self.done),
+            'stacks': {
+                str(index): [
+                    [node.tail, node.offset, words_left, words, found]
+                    for node, words_left, words, found in stack
+                ]
+                for index, stack in self.stacks.items()
+            },
+            'output_size': self.output_size,
+            'finished': self.finished,
+        }
+        temp_file_name = f'{file_name}.tmp'
+        with open(temp_file_name, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file_name, file_name)
+
+    @staticmethod
+    def load(file_name: str) -> Checkpoint:
+        with open(file_name, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+
+        return Checkpoint(
+            parameters=data['parameters'],
+            done=set(data['done']),
+            stacks={
+                int(index): [
+                    (Node(tail, offset), words_left, words, found)
+                    for tail, offset, words_left, words, found in stack
+                ]
+                for index, stack in data['stacks'].items()
+            },
+            output_size=data['output_size'],
+            finished=data.get('finished', False),
+        )
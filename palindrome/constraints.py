@@ -0,0 +1,133 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .graph import PalindromeGraph
+from .graph_building import calculate_distances, group_edges
+from .graph_elements import Node, StartEdge, Edge
+
+
+@dataclass(frozen=True)
+class Constraints:
+    """ Restrictions on the generated palindromes.
+        `required_words` should all be present,
+        at least one of `any_of_words` should be present (if given),
+        `forbidden_words` should all be absent,
+        the palindrome should start with the `prefix` word sequence
+        and end with the `suffix` word sequence,
+        and its length in characters (including spaces)
+        should not exceed `max_length`.
+    """
+    required_words: tuple[str, ...] = ()
+    any_of_words: tuple[str, ...] = ()
+    forbidden_words: tuple[str, ...] = ()
+    prefix: tuple[str, ...] = ()
+    suffix: tuple[str, ...] = ()
+    max_length: Optional[int] = None
+
+
+@dataclass
+class SearchConstraints:
+    """ Constraints prepared for pruning the search over a particular graph.
+        Edges with forbidden words are removed from `edges_from_node`
+        and `distances` are calculated without them.
+        Every group of required words (a single required word
+        or all of the `any_of_words`) is assigned a bit,
+        `word_masks` gives the bits of the groups a word belongs to.
+        `required_distances[i]` gives the distance from a node
+        to the final node along a path containing a word of the `i`-th group.
+        `min_lengths` gives the minimal number of characters
+        to be added to reach the final node.
+    """
+    start_edges: list[StartEdge]
+    edges_from_node: dict[Node, list[Edge]]
+    distances: dict[Node, int]
+    word_masks: dict[str, int]
+    required_distances: list[dict[Node, int]]
+    min_lengths: Optional[dict[Node, int]]
+    prefix: tuple[str, ...] = ()
+    suffix: tuple[str, ...] = ()
+    max_length: Optional[int] = None
+    full_mask: int = field(init=False)
+
+    def __post_init__(self):
+        self.full_mask = (1 << len(self.required_distances)) - 1
+
+    def is_acceptable(self, words: str) -> bool:
+        """ Checks the constraints that are not enforced by pruning.
+        """
+        if not self.prefix and not self.suffix:
+            return True
+        word_list = tuple(words.split(' '))
+        return (word_list[:len(self.prefix)] == self.prefix and
+                (not self.suffix or word_list[-len(self.suffix):] == self.suffix))
+
+
+def prepare_constraints(
+        graph: PalindromeGraph,
+        constraints: Constraints
+) -> SearchConstraints:
+    forbidden_words = set(constraints.forbidden_words)
+    edges = [
+        edge
+        for edges in graph.edges_from_node.values()
+        for edge in edges
+        if edge.word not in forbidden_words
+    ]
+    distances = calculate_distances(edges)
+
+    # Words of the prefix and suffix are required as well
+    required_words = dict.fromkeys(
+        constraints.required_words + constraints.prefix + constraints.suffix)
+    required_groups = [{word} for word in required_words]
+    if constraints.any_of_words:
+        required_groups.append(set(constraints.any_of_words))
+
+    word_masks: dict[str, int] = {}
+    for i, group in enumerate(required_groups):
+        for word in group:
+            word_masks[word] = word_masks.get(word, 0) | 1 << i
+    required_distances = [
+        calculate_required_distances(edges, distances, group)
+        for group in required_groups
+    ]
+
+    min_lengths = None
+    if constraints.max_length is not None:
+        min_lengths = calculate_distances(
+            edges, get_weight=lambda edge: len(edge.word) + 1)
+
+    return SearchConstraints(
+        start_edges=[
+            start_edge
+            for start_edge in graph.start_edges
+            if start_edge.word not in forbidden_words
+            and start_edge.to_node in distances
+        ],
+        edges_from_node=group_edges(edges, distances),
+        distances=distances,
+        word_masks=word_masks,
+        required_distances=required_distances,
+        min_lengths=min_lengths,
+        prefix=constraints.prefix,
+        suffix=constraints.suffix,
+        max_length=constraints.max_length,
+    )
+
+
+def calculate_required_distances(
+        edges: list[Edge],
+        distances: dict[Node, int],
+        words: set[str]
+) -> dict[Node, int]:
+    """ Finds distance from every node to the final node
+        along a path containing an edge with one of the `words`.
+        Nodes from which such a path does not exist are omitted.
+    """
+    initial_distances: dict[Node, int] = {}
+    for edge in edges:
+        if edge.word in words and edge.to_node in distances:
+            distance = distances[edge.to_node] + 1
+            if initial_distances.get(edge.from_node, distance) >= distance:
+                initial_distances[edge.from_node] = distance
+
+    return calculate_distances(edges, initial_distances)
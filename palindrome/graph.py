@@ -1,6 +1,5 @@
-from collections import defaultdict
-
-from .graph_building import get_start_edges, get_edges, calculate_distances
+from .graph_building import (get_start_edges, get_edges,
+                             calculate_distances, group_edges)
 from .graph_elements import Node, StartEdge, Edge
 
 
@@ -35,7 +34,4 @@ class PalindromeGraph:
         ]
 
         # Group edges by from-node leaving only useful ones
-        self.edges_from_node = defaultdict(list)
-        for edge in edges:
-            if edge.to_node in self.distances:
-                self.edges_from_node[edge.from_node].append(edge)
+        self.edges_from_node = group_edges(edges, self.distances)
@@ -1,6 +1,6 @@
 from collections import defaultdict
 from queue import PriorityQueue
-from typing import Iterable, Optional
+from typing import Callable, Iterable, Optional
 
 from .graph_elements import Node, StartEdge, Edge
 from .prioritized import Prioritized
@@ -39,32 +39,58 @@ def get_edges(
                     stack.append(to_node)
 
 
-def calculate_distances(edges: Iterable[Edge]) -> dict[Node, int]:
+def calculate_distances(
+        edges: Iterable[Edge],
+        initial_distances: Optional[dict[Node, int]] = None,
+        get_weight: Callable[[Edge], int] = lambda edge: 1
+) -> dict[Node, int]:
     """ Finds distance from every node to the final node.
+        If `initial_distances` are given, they are used instead of
+        the final node, i. e. finds the distance to the closest of them
+        taking its initial distance into account.
+        `get_weight` gives the length of an edge (1 by default).
     """
-    from_nodes_by_to_node: dict[Node, list[Node]] = defaultdict(list)
+    edges_by_to_node: dict[Node, list[Edge]] = defaultdict(list)
     for edge in edges:
-        from_nodes_by_to_node[edge.to_node].append(edge.from_node)
+        edges_by_to_node[edge.to_node].append(edge)
 
-    final_node = Node('', 0)
-    distances = {final_node: 0}
+    if initial_distances is None:
+        final_node = Node('', 0)
+        initial_distances = {final_node: 0}
+    distances = dict(initial_distances)
 
     queue: PriorityQueue[Prioritized[Node]] = PriorityQueue()
-    queue.put(Prioritized(0, final_node))
+    for node, distance in distances.items():
+        queue.put(Prioritized(distance, node))
 
     while not queue.empty():
         prioritized = queue.get()
-        from_node_distance = prioritized.priority + 1
+        if prioritized.priority > distances[prioritized.item]:
+            continue  # outdated queue entry
 
-        for from_node in from_nodes_by_to_node[prioritized.item]:
-            distance = distances.get(from_node)
+        for edge in edges_by_to_node[prioritized.item]:
+            from_node_distance = prioritized.priority + get_weight(edge)
+            distance = distances.get(edge.from_node)
             if distance is None or distance > from_node_distance:
-                distances[from_node] = from_node_distance
-                queue.put(Prioritized(from_node_distance, from_node))
+                distances[edge.from_node] = from_node_distance
+                queue.put(Prioritized(from_node_distance, edge.from_node))
 
     return distances
 
 
+def group_edges(
+        edges: Iterable[Edge],
+        distances: dict[Node, int]
+) -> dict[Node, list[Edge]]:
+    """ Groups edges by their from-nodes leaving only useful ones.
+    """
+    edges_from_node: dict[Node, list[Edge]] = defaultdict(list)
+    for edge in edges:
+        if edge.to_node in distances:
+            edges_from_node[edge.from_node].append(edge)
+    return edges_from_node
+
+
 def try_create_start_node(caseless_word: str, offset: int) -> Optional[Node]:
     matching_part, tail = slice_by_offset(caseless_word, offset)
 
@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+
+from .graph_elements import Node, Edge
+
+
+@dataclass
+class Progress:
+    """ Progress of a generation.
+        Work is measured in search steps, i. e. in graph paths examined.
+        `total_work` is estimated in advance over the graph without
+        the forbidden words, but without pruning by required words
+        (including the words of the prefix, suffix, and any-of groups)
+        and by length, so it is an upper bound for such searches.
+    """
+    start_edge_count: int
+    finished_start_edge_count: int
+    total_work: int
+    done_work: int
+    palindrome_count: int
+
+    @property
+    def fraction(self) -> float:
+        if self.finished_start_edge_count == self.start_edge_count:
+            return 1.0
+        return min(self.done_work / self.total_work, 1.0) if self.total_work else 0.0
+
+
+@dataclass
+class GenerationResult:
+    """ Palindromes found within a budget.
+        `complete` is True iff the search has finished,
+        i. e. `palindromes` contains all the palindromes.
+    """
+    palindromes: list[str]
+    complete: bool
+    progress: Progress
+
+
+class SubtreeSizes:
+    """ Counts search steps needed to explore the subtree of a stack entry,
+        i. e. the number of paths of at most `words_left` edges from `node`
+        that the search examines.
+    """
+
+    def __init__(
+            self,
+            edges_from_node: dict[Node, list[Edge]],
+            distances: dict[Node, int]):
+        self.edges_from_node = edges_from_node
+        self.distances = distances
+        self.sizes: dict[tuple[Node, int], int] = {}
+
+    def get(self, node: Node, words_left: int) -> int:
+        distance = self.distances.get(node)
+        if distance is None or distance > words_left or words_left == 0:
+            return 1
+
+        size = self.sizes.get((node, words_left))
+        if size is None:
+            size = 1 + sum(
+                self.get(edge.to_node, words_left - 1)
+                for edge in self.edges_from_node[node]
+            )
+            self.sizes[(node, words_left)] = size
+        return size
@@ -0,0 +1,227 @@
+""" Level-synchronous palindrome generation using NumPy.
+    Instead of expanding one stack entry at a time, whole frontiers
+    (all the paths with the same word count) are expanded at once.
+    A frontier is stored as arrays of records: node id, parent record id,
+    and word id. Palindromes are reconstructed from parent pointers.
+    Frontiers are split into chunks that are processed depth-first,
+    so only the chunks on the current path are kept in memory.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+
+from .constraints import SearchConstraints
+from .graph_elements import Node, StartEdge, Edge
+
+CHUNK_SIZE = 1 << 16
+UNREACHABLE = np.iinfo(np.int32).max // 2
+
+
+class CsrGraph:
+    """ Palindrome graph as a CSR adjacency over node ids:
+        edges from node `i` are `edge_to_nodes[edge_starts[i]:edge_starts[i + 1]]`
+        marked with `edge_words` respectively.
+        Node properties are arrays indexed by node id, word properties
+        are arrays indexed by word id.
+    """
+
+    def __init__(
+            self,
+            start_edges: list[StartEdge],
+            edges_from_node: dict[Node, list[Edge]],
+            distances: dict[Node, int],
+            constraints: Optional[SearchConstraints] = None):
+        self.nodes = list(distances)
+        node_ids = {node: i for i, node in enumerate(self.nodes)}
+        word_ids: dict[str, int] = {}
+
+        edge_starts = [0]
+        edge_to_nodes: list[int] = []
+        edge_words: list[int] = []
+        for node in self.nodes:
+            for edge in edges_from_node.get(node, []):
+                edge_to_nodes.append(node_ids[edge.to_node])
+                edge_words.append(word_ids.setdefault(edge.word, len(word_ids)))
+            edge_starts.append(len(edge_to_nodes))
+
+        self.start_nodes = np.array(
+            [node_ids[start_edge.to_node] for start_edge in start_edges],
+            dtype=np.int32)
+        self.start_words = np.array(
+            [word_ids.setdefault(start_edge.word, len(word_ids))
+             for start_edge in start_edges],
+            dtype=np.int32)
+
+        self.words = list(word_ids)
+        self.edge_starts = np.array(edge_starts, dtype=np.int64)
+        self.edge_to_nodes = np.array(edge_to_nodes, dtype=np.int32)
+        self.edge_words = np.array(edge_words, dtype=np.int32)
+        self.distances = self.node_array(distances)
+        self.prepends = np.array([node.offset < 0 for node in self.nodes], dtype=bool)
+        self.word_lengths = np.array([len(word) for word in self.words], dtype=np.int32)
+
+        # constraints
+        self.constraints = constraints
+        self.word_masks = np.zeros(len(self.words), dtype=np.int64)
+        self.full_mask = 0
+        self.required_distances: list[np.ndarray] = []
+        self.min_lengths: Optional[np.ndarray] = None
+        self.max_length: Optional[int] = None
+        if constraints is not None:
+            for word, word_id in word_ids.items():
+                self.word_masks[word_id] = constraints.word_masks.get(word, 0)
+            self.full_mask = constraints.full_mask
+            self.required_distances = [
+                self.node_array(required_distance)
+                for required_distance in constraints.required_distances
+            ]
+            if constraints.min_lengths is not None:
+                self.min_lengths = self.node_array(constraints.min_lengths)
+            self.max_length = constraints.max_length
+
+    def node_array(self, values: dict[Node, int]) -> np.ndarray:
+        return np.array([values.get(node, UNREACHABLE) for node in self.nodes],
+                        dtype=np.int32)
+
+
+@dataclass
+class Chunk:
+    """ Records of a part of a frontier. `parents` are indices
+        of the records in the previous chunk of the path.
+        `found` are masks of the required words present,
+        `lengths` are lengths of the fragments in characters.
+    """
+    nodes: np.ndarray
+    parents: np.ndarray
+    words: np.ndarray
+    found: np.ndarray
+    lengths: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def select(self, indices) -> Chunk:
+        return Chunk(self.nodes[indices], self.parents[indices],
+                     self.words[indices], self.found[indices],
+                     self.lengths[indices])
+
+    def split(self, size: int) -> Iterator[Chunk]:
+        for start in range(0, len(self), size):
+            yield self.select(slice(start, start + size))
+
+
+def generate_vectorized(
+        graph: CsrGraph,
+        max_word_count: int,
+        chunk_size: int = CHUNK_SIZE
+) -> list[str]:
+    """ Returns all the palindromes with <= `max_word_count` words
+        satisfying the constraints of the graph.
+    """
+    palindromes: list[str] = []
+    if max_word_count <= 0:
+        return palindromes
+
+    words = graph.start_words
+    root = Chunk(graph.start_nodes, np.full(len(words), -1, dtype=np.int64),
+                 words, graph.word_masks[words],
+                 graph.word_lengths[words].astype(np.int64))
+    for chunk in root.split(chunk_size):
+        process_chunk(graph, [chunk], max_word_count - 1, chunk_size,
+                      palindromes.append)
+    return palindromes
+
+
+def process_chunk(
+        graph: CsrGraph,
+        path: list[Chunk],
+        words_left: int,
+        chunk_size: int,
+        output: Callable[[str], None]):
+    """ Outputs the palindromes among the records of the last chunk of `path`
+        and processes their descendants depth-first.
+    """
+    chunk = path[-1].select(get_viable(graph, path[-1], words_left))
+    path[-1] = chunk
+    if len(chunk) == 0:
+        return
+
+    final = graph.distances[chunk.nodes] == 0
+    if graph.full_mask:
+        final &= chunk.found == graph.full_mask
+    if graph.max_length is not None:
+        final &= chunk.lengths <= graph.max_length
+    final_indices = np.flatnonzero(final)
+    if len(final_indices):
+        for palindrome in reconstruct(graph, path, final_indices):
+            if graph.constraints is None or graph.constraints.is_acceptable(palindrome):
+                output(palindrome)
+
+    if words_left > 0:
+        children = expand(graph, chunk)
+        for child_chunk in children.split(chunk_size):
+            process_chunk(graph, path + [child_chunk], words_left - 1,
+                          chunk_size, output)
+
+
+def get_viable(graph: CsrGraph, chunk: Chunk, words_left: int) -> np.ndarray:
+    """ Returns a mask of the records that can still lead to palindromes.
+    """
+    viable = graph.distances[chunk.nodes] <= words_left
+    for i, required_distances in enumerate(graph.required_distances):
+        missing = (chunk.found & (1 << i)) == 0
+        viable &= ~missing | (required_distances[chunk.nodes] <= words_left)
+    if graph.min_lengths is not None and graph.max_length is not None:
+        viable &= chunk.lengths + graph.min_lengths[chunk.nodes] <= graph.max_length
+    return viable
+
+
+def expand(graph: CsrGraph, chunk: Chunk) -> Chunk:
+    """ Gathers the records for all the edges from the nodes of the chunk.
+    """
+    starts = graph.edge_starts[chunk.nodes]
+    counts = graph.edge_starts[chunk.nodes + 1] - starts
+    parents = np.repeat(np.arange(len(chunk), dtype=np.int64), counts)
+    # edge index = start of the parent's edges + index within them
+    first_children = np.cumsum(counts) - counts
+    edges = starts[parents] + np.arange(len(parents)) - first_children[parents]
+
+    words = graph.edge_words[edges]
+    return Chunk(graph.edge_to_nodes[edges], parents, words,
+                 chunk.found[parents] | graph.word_masks[words],
+                 chunk.lengths[parents] + 1 + graph.word_lengths[words])
+
+
+def reconstruct(
+        graph: CsrGraph,
+        path: list[Chunk],
+        indices: np.ndarray
+) -> Iterator[str]:
+    """ Builds palindromes from the records of the last chunk of `path`
+        following parent pointers.
+    """
+    levels = len(path)
+    word_ids = np.empty((levels, len(indices)), dtype=np.int32)
+    prepends = np.empty((levels, len(indices)), dtype=bool)
+    for level in range(levels - 1, -1, -1):
+        chunk = path[level]
+        word_ids[level] = chunk.words[indices]
+        if level > 0:
+            indices = chunk.parents[indices]
+            # the word goes to the side opposite to the from-node's tail
+            prepends[level] = graph.prepends[path[level - 1].nodes[indices]]
+
+    words = graph.words
+    for column in range(word_ids.shape[1]):
+        left: list[str] = []
+        right: list[str] = []
+        for level in range(1, levels):
+            word = words[word_ids[level, column]]
+            (left if prepends[level, column] else right).append(word)
+        left.reverse()
+        left.append(words[word_ids[0, column]])
+        left.extend(right)
+        yield ' '.join(left)
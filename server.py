@@ -0,0 +1,423 @@
+""" Palindrome query service.
+    Keeps the palindrome graphs for all the word lists and the language model
+    in memory and runs CPU-heavy work on a process pool.
+
+    Endpoints:
+    * `GET /generate?max_word_count=N&words=pu&...` — streams palindromes
+      as JSON lines: `{"palindromes": [...]}` for every batch found
+      and `{"complete": true|false, "count": N}` at the end.
+      If the generation fails, the last line also contains `"error"`.
+      Optional parameters: `contains`, `exclude` (can be repeated),
+      `starts_with`, `ends_with`, `max_length`, `only_new` with `add`.
+    * `POST /grammar-filter` — takes `{"sentences": [...]}`,
+      returns the grammatically valid ones in the same format.
+    * `POST /sort?criterion=lm` — takes `{"sentences": [...]}`,
+      returns them sorted in the same format.
+
+    Every endpoint accepts a `deadline` parameter in seconds.
+    Generation stops at the deadline returning the palindromes found so far,
+    other endpoints respond with 504.
+    When a client disconnects, its request is cancelled.
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import multiprocessing
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Awaitable, Callable, Optional
+from urllib.parse import urlsplit, parse_qs
+
+from grammar import filter_chunk
+from palindrome import (PalindromeGenerator, Constraints,
+                        SearchTask, initial_stack, run_search_task)
+from sorting import get_sort_key, is_scoring_criterion, score_chunk
+from words import get_word_list
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8020
+WORD_LISTS = {'p': 'pu', 's': 'ku-suli', 'l': 'ku-lili'}
+SEARCH_STEP_COUNT = 20_000
+CHUNK_SIZE = 1000
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: dict[str, list[str]]
+    body: bytes
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        values = self.query.get(name)
+        return values[-1] if values else default
+
+    def get_int(self, name: str, default: Optional[int] = None) -> Optional[int]:
+        value = self.get(name)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise HttpError(400, f'invalid {name}')
+
+    def get_float(self, name: str) -> Optional[float]:
+        value = self.get(name)
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise HttpError(400, f'invalid {name}')
+
+    def get_sentences(self) -> list[str]:
+        try:
+            sentences = json.loads(self.body)['sentences']
+        except (ValueError, KeyError, TypeError):
+            raise HttpError(400, 'expected {"sentences": [...]}')
+        if not isinstance(sentences, list) or not all(
+                isinstance(sentence, str) for sentence in sentences):
+            raise HttpError(400, 'sentences should be a list of strings')
+        return sentences
+
+
+class PalindromeServer:
+    """ Serves palindrome queries keeping the graphs warm.
+        Searches are split into tasks of at most `SEARCH_STEP_COUNT` steps,
+        so they can be stopped at a deadline or on cancellation.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.generators = {
+            words: PalindromeGenerator(get_word_list(words))
+            for words in WORD_LISTS.values()
+        }
+        max_workers = max_workers or os.cpu_count() or 1
+        # The language model is loaded by `score_chunk` on first use,
+        # so failing to load it does not break the pool for other requests.
+        # Workers are started on demand while connections are open,
+        # so they are spawned rather than forked not to inherit the sockets
+        # and keep them open after the server closes them.
+        self.pool = ProcessPoolExecutor(
+            max_workers, mp_context=multiprocessing.get_context('spawn'))
+        self.max_running_tasks = max_workers * 2
+
+    async def start(
+            self,
+            host: str = DEFAULT_HOST,
+            port: int = DEFAULT_PORT
+    ) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def handle_connection(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter):
+        try:
+            try:
+                request = await read_request(reader)
+            except (HttpError, asyncio.IncompleteReadError, ValueError) as error:
+                message = error.message if isinstance(error, HttpError) else 'bad request'
+                await write_error(writer, 400, message)
+                return
+
+            # The client sends nothing after the request,
+            # so the end of the stream means it has disconnected
+            handling = asyncio.create_task(self.handle_request(request, writer))
+            disconnection = asyncio.create_task(reader.read())
+            await asyncio.wait({handling, disconnection},
+                               return_when=asyncio.FIRST_COMPLETED)
+            for task in (handling, disconnection):
+                task.cancel()
+            try:
+                await handling
+            except asyncio.CancelledError:
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def handle_request(
+            self,
+            request: Request,
+            writer: asyncio.StreamWriter):
+        try:
+            match (request.method, request.path):
+                case ('GET', '/generate'):
+                    await self.handle_generate(request, writer)
+                case ('POST', '/grammar-filter'):
+                    await self.handle_with_deadline(
+                        request, writer, self.grammar_filter(request.get_sentences()))
+                case ('POST', '/sort'):
+                    criterion = request.get('criterion', 'a')
+                    await self.handle_with_deadline(
+                        request, writer, self.sort(request.get_sentences(), criterion))
+                case (_, '/generate' | '/grammar-filter' | '/sort'):
+                    raise HttpError(405, 'method not allowed')
+                case _:
+                    raise HttpError(404, 'not found')
+        except HttpError as error:
+            await write_error(writer, error.status, error.message)
+        except ConnectionError:
+            raise
+        except Exception as error:
+            traceback.print_exc()
+            await write_error(writer, 500, str(error) or type(error).__name__)
+
+    async def handle_with_deadline(
+            self,
+            request: Request,
+            writer: asyncio.StreamWriter,
+            coroutine: Awaitable[list[str]]):
+        try:
+            sentences = await asyncio.wait_for(coroutine,
+                                               request.get_float('deadline'))
+        except asyncio.TimeoutError:
+            raise HttpError(504, 'deadline exceeded')
+        await write_json(writer, {'sentences': sentences})
+
+    async def handle_generate(
+            self,
+            request: Request,
+            writer: asyncio.StreamWriter):
+        max_word_count = request.get_int('max_word_count')
+        if max_word_count is None:
+            raise HttpError(400, 'max_word_count is required')
+        words = request.get('words', 'pu')
+        words = WORD_LISTS.get(words, words)
+        if words not in self.generators:
+            raise HttpError(400, 'invalid word list')
+
+        word_list = get_word_list(words)
+        added_words = [word for word in dict.fromkeys(request.query.get('add', []))
+                       if word not in word_list]
+        constraints = get_constraints(request, added_words)
+        deadline = request.get_float('deadline')
+
+        if added_words:
+            loop = asyncio.get_running_loop()
+            generator = await loop.run_in_executor(
+                self.pool, PalindromeGenerator, word_list + added_words)
+        else:
+            generator = self.generators[words]
+
+        await write_chunked_headers(writer, 'application/x-ndjson')
+        count = 0
+        summary: dict[str, Any] = {'complete': True}
+        try:
+            async for palindromes in self.generate(
+                    generator, max_word_count, constraints, deadline):
+                count += len(palindromes)
+                await write_chunk(writer, json_line({'palindromes': palindromes}))
+        except asyncio.TimeoutError:
+            summary['complete'] = False
+        except ConnectionError:
+            raise
+        except Exception as error:
+            # The status is already sent, so the error ends the stream
+            traceback.print_exc()
+            summary = {'complete': False, 'error': str(error) or type(error).__name__}
+        summary['count'] = count
+        await write_chunk(writer, json_line(summary))
+        await write_chunk(writer, b'')
+
+    async def generate(
+            self,
+            generator: PalindromeGenerator,
+            max_word_count: int,
+            constraints: Constraints,
+            deadline: Optional[float] = None
+    ) -> AsyncIterable[list[str]]:
+        """ Yields batches of palindromes as they are found.
+            Raises `asyncio.TimeoutError` if the deadline is exceeded
+            before the search is done.
+        """
+        loop = asyncio.get_running_loop()
+        end_time = None if deadline is None else loop.time() + deadline
+
+        search_constraints = generator.prepare_constraints(constraints)
+        contexts = [
+            generator.get_context(start_edge, max_word_count, search_constraints)
+            for start_edge in generator.get_start_edges(search_constraints)
+        ]
+        pending = [
+            SearchTask(index, context, initial_stack(context), SEARCH_STEP_COUNT)
+            for index, context in reversed(list(enumerate(contexts)))
+        ]
+        running: set[asyncio.Future] = set()
+        try:
+            while pending or running:
+                while pending and len(running) < self.max_running_tasks:
+                    running.add(loop.run_in_executor(
+                        self.pool, run_search_task, pending.pop()))
+
+                timeout = None if end_time is None else end_time - loop.time()
+                if timeout is not None and timeout <= 0:
+                    raise asyncio.TimeoutError()
+                done, running = await asyncio.wait(
+                    running, timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED)
+
+                for future in done:
+                    index, palindromes, stack = future.result()
+                    if stack:
+                        pending.append(SearchTask(index, contexts[index],
+                                                  stack, SEARCH_STEP_COUNT))
+                    if palindromes:
+                        yield palindromes
+        finally:
+            for future in running:
+                future.cancel()
+
+    async def grammar_filter(self, sentences: list[str]) -> list[str]:
+        results = await self.map_chunks(filter_chunk, sentences)
+        return [sentence for chunk in results for sentence in chunk]
+
+    async def sort(self, sentences: list[str], criterion: str) -> list[str]:
+        criterion = criterion.lower()
+        if is_scoring_criterion(criterion):
+            # the model is needed only in the workers
+            results = await self.map_chunks(score_chunk, sentences)
+            return [sentence for _, sentence in heapq.merge(*results)]
+        try:
+            sort_key = get_sort_key(criterion)
+        except ValueError as error:
+            raise HttpError(400, str(error))
+        return sorted(sentences, key=sort_key)
+
+    async def map_chunks(
+            self,
+            function: Callable[[list[str]], list[Any]],
+            items: list[str]
+    ) -> list[list[Any]]:
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(self.pool, function, items[i:i + CHUNK_SIZE])
+            for i in range(0, len(items), CHUNK_SIZE)
+        ]
+        try:
+            return await asyncio.gather(*futures)
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def get_constraints(request: Request, added_words: list[str]) -> Constraints:
+    starts_with = request.get('starts_with')
+    ends_with = request.get('ends_with')
+    only_new = request.get('only_new') not in (None, '', '0', 'false')
+    if only_new and not added_words:
+        raise HttpError(400, 'only_new requires new words to be added')
+    return Constraints(
+        required_words=tuple(request.query.get('contains', [])),
+        any_of_words=tuple(added_words) if only_new else (),
+        forbidden_words=tuple(request.query.get('exclude', [])),
+        prefix=tuple(starts_with.split()) if starts_with else (),
+        suffix=tuple(ends_with.split()) if ends_with else (),
+        max_length=request.get_int('max_length'),
+    )
+
+
+async def read_request(reader: asyncio.StreamReader) -> Request:
+    request_line = (await reader.readuntil(b'\r\n')).decode('latin-1')
+    try:
+        method, target, _ = request_line.split(' ', 2)
+    except ValueError:
+        raise HttpError(400, 'invalid request line')
+
+    content_length = 0
+    while (line := await reader.readuntil(b'\r\n')) != b'\r\n':
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            content_length = int(value)
+
+    body = await reader.readexactly(content_length)
+    url = urlsplit(target)
+    return Request(method, url.path, parse_qs(url.query), body)
+
+
+def json_line(data) -> bytes:
+    return (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+async def write_json(writer: asyncio.StreamWriter, data, status: int = 200):
+    body = json_line(data)
+    writer.write(
+        f'HTTP/1.1 {status} {status_text(status)}\r\n'
+        f'Content-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\n'
+        f'Connection: close\r\n\r\n'.encode('latin-1') + body)
+    await writer.drain()
+
+
+async def write_error(writer: asyncio.StreamWriter, status: int, message: str):
+    await write_json(writer, {'error': message}, status)
+
+
+async def write_chunked_headers(writer: asyncio.StreamWriter, content_type: str):
+    writer.write(
+        f'HTTP/1.1 200 OK\r\n'
+        f'Content-Type: {content_type}\r\n'
+        f'Transfer-Encoding: chunked\r\n'
+        f'Connection: close\r\n\r\n'.encode('latin-1'))
+    await writer.drain()
+
+
+async def write_chunk(writer: asyncio.StreamWriter, data: bytes):
+    writer.write(f'{len(data):x}\r\n'.encode('latin-1') + data + b'\r\n')
+    await writer.drain()
+
+
+def status_text(status: int) -> str:
+    return {
+        200: 'OK',
+        400: 'Bad Request',
+        404: 'Not Found',
+        405: 'Method Not Allowed',
+        500: 'Internal Server Error',
+        504: 'Gateway Timeout',
+    }[status]
+
+
+async def serve(host: str, port: int, max_workers: Optional[int]):
+    palindrome_server = PalindromeServer(max_workers)
+    server = await palindrome_server.start(host, port)
+    print(f'Serving on {host}:{port}')
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        palindrome_server.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Serves toki pona palindrome queries over HTTP.')
+    parser.add_argument('--host', default=DEFAULT_HOST, type=str,
+                        help=f'host to listen on (default {DEFAULT_HOST})')
+    parser.add_argument('--port', default=DEFAULT_PORT, type=int,
+                        help=f'port to listen on (default {DEFAULT_PORT})')
+    parser.add_argument('--workers', type=int,
+                        help='worker process count (CPU count by default)')
+
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.host, args.port, args.workers))
@@ -0,0 +1,70 @@
+import heapq
+import multiprocessing
+from functools import partial
+from typing import Callable, Any
+
+from grammar import filter_chunk
+from language_model import get_language_model
+
+MIN_SENTENCE_COUNT_FOR_MULTIPROCESSING = 500
+SCORING_CHUNK_SIZE = 5000
+
+
+def get_sort_key(value: str) -> Callable[[str], Any]:
+    match value:
+        case 'a' | 'alphabetical':
+            return lambda s: s
+        case 'l' | 'length':
+            return lambda s: (len(s), s)
+        case 'w' | 'word-count':
+            return lambda s: (s.count(' '), s)
+        case 'lm' | 'language-model':
+            score_sentence = get_language_model().score_sentence
+            return lambda s: (score_sentence(s), s)
+        case _:
+            raise ValueError('invalid sorting criterion')
+
+
+def is_scoring_criterion(value: str) -> bool:
+    """ Checks if sentences are sorted by a numeric score
+        that is better computed with `sort_by_score`.
+    """
+    return value in ('lm', 'language-model')
+
+
+def sort_by_score(
+        sentences: list[str],
+        check_grammar: bool = False
+) -> list[tuple[float, str]]:
+    """ Returns (score, sentence) pairs sorted by the language model score.
+        Sentences are scored in batches on a worker pool.
+        The model is loaded before the pool is started, so loading errors
+        are raised here, and forked workers inherit the loaded model.
+        If `check_grammar` is set, the workers filter the sentences by grammar
+        before scoring, so no separate pass is needed.
+    """
+    if len(sentences) < MIN_SENTENCE_COUNT_FOR_MULTIPROCESSING:
+        # single process
+        return score_chunk(sentences, check_grammar)
+    else:
+        # multiprocessing
+        chunks = (sentences[i:i + SCORING_CHUNK_SIZE]
+                  for i in range(0, len(sentences), SCORING_CHUNK_SIZE))
+        get_language_model()
+        with multiprocessing.Pool() as pool:
+            results = pool.imap_unordered(
+                partial(score_chunk, check_grammar=check_grammar), chunks)
+            return list(heapq.merge(*results))
+
+
+def score_chunk(
+        sentences: list[str],
+        check_grammar: bool = False
+) -> list[tuple[float, str]]:
+    """ Returns sorted (score, sentence) pairs.
+        Can be executed in a separate process.
+    """
+    if check_grammar:
+        sentences = filter_chunk(sentences)
+    scores = get_language_model().score_sentences(sentences)
+    return sorted(zip(scores, sentences))
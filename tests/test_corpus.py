@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+import corpus
+from corpus import load_corpus, get_sentences
+
+
+def write(path, text: str):
+    path.write_text(text, encoding='utf-8')
+
+
+@pytest.fixture
+def corpus_path(tmp_path):
+    path = tmp_path / 'corpus'
+    path.mkdir()
+    write(path / 'a.txt', 'mi pona. sina, pona!  # comment\ntoki a\n')
+    write(path / 'b.txt', 'jan Sonja li pona: ona li toki\n')
+    return path
+
+
+def expected_sentences(path) -> list[str]:
+    return [
+        sentence
+        for file_name in sorted(os.listdir(path))
+        for sentence in get_sentences(str(path / file_name))
+    ]
+
+
+def test_sentences_are_normalized(corpus_path):
+    assert list(get_sentences(str(corpus_path / 'a.txt'))) == [
+        'mi pona', 'sina pona', 'toki a']
+
+
+def test_load_corpus(tmp_path, corpus_path):
+    loaded = load_corpus(str(corpus_path), str(tmp_path / 'cache'))
+    assert len(loaded) == 5
+    assert list(loaded) == expected_sentences(corpus_path)
+    assert sorted(loaded.vocabulary) == sorted(set(' '.join(loaded).split()))
+
+
+def test_cache_invalidation(tmp_path, corpus_path, monkeypatch):
+    cache_path = str(tmp_path / 'cache')
+    load_corpus(str(corpus_path), cache_path)
+
+    tokenized = []
+    tokenize_file = corpus.tokenize_file
+    monkeypatch.setattr(corpus, 'tokenize_file',
+                        lambda file_path: tokenized.append(file_path)
+                        or tokenize_file(file_path))
+
+    # unchanged
+    assert list(load_corpus(str(corpus_path), cache_path)) == expected_sentences(corpus_path)
+    assert tokenized == []
+
+    # touched but not changed
+    os.utime(corpus_path / 'a.txt', ns=(0, 0))
+    assert list(load_corpus(str(corpus_path), cache_path)) == expected_sentences(corpus_path)
+    assert tokenized == []
+
+    # changed and added
+    write(corpus_path / 'a.txt', 'ona li suli\n')
+    write(corpus_path / 'c.txt', 'o kama\n')
+    loaded = load_corpus(str(corpus_path), cache_path)
+    assert list(loaded) == expected_sentences(corpus_path)
+    assert sorted(map(os.path.basename, tokenized)) == ['a.txt', 'c.txt']
+
+    # removed
+    os.remove(corpus_path / 'b.txt')
+    assert list(load_corpus(str(corpus_path), cache_path)) == expected_sentences(corpus_path)
+
+
+def test_parallel_tokenization(tmp_path, corpus_path, monkeypatch):
+    monkeypatch.setattr(corpus, 'MIN_SIZE_FOR_MULTIPROCESSING', 0)
+    loaded = load_corpus(str(corpus_path), str(tmp_path / 'cache'))
+    assert list(loaded) == expected_sentences(corpus_path)
@@ -6,10 +6,11 @@ good_phrases = ["toki", "a", "mi pona", "sina sona ala sona e toki pona?"]
 bad_phrases = ["tau popolam", "betonomeshalka"]
 
 
+@pytest.mark.parametrize('ngram_order', [2, 3])
 @pytest.mark.parametrize('good_phrase', good_phrases)
 @pytest.mark.parametrize('bad_phrase', bad_phrases)
-def test_language_model_perplexity(good_phrase, bad_phrase):
-    lm = LanguageModel()
+def test_language_model_perplexity(good_phrase, bad_phrase, ngram_order):
+    lm = LanguageModel(ngram_order)
     good_score = lm.score_sentence(good_phrase)
     bad_score = lm.score_sentence(bad_phrase)
     assert good_score < bad_score
@@ -0,0 +1,59 @@
+from math import log2
+
+import pytest
+
+from ngram import NgramModel, pad
+
+sentences = [
+    ['mi', 'pona'],
+    ['sina', 'pona'],
+    ['mi', 'moku', 'e', 'kili'],
+    ['mi', 'pona', 'a'],
+]
+
+
+def count(ngram: tuple[str, ...], order: int) -> int:
+    padded = [pad(sentence, order) for sentence in sentences]
+    return sum(
+        tuple(words[i:i + len(ngram)]) == ngram
+        for words in padded
+        for i in range(len(words) - len(ngram) + 1)
+    )
+
+
+def context_total(context: tuple[str, ...], order: int) -> int:
+    padded = [pad(sentence, order) for sentence in sentences]
+    length = len(context) + 1
+    return sum(
+        tuple(words[i:i + len(context)]) == context
+        for words in padded
+        for i in range(len(words) - length + 1)
+    )
+
+
+@pytest.mark.parametrize('order', [1, 2, 3, 5])
+@pytest.mark.parametrize('gamma', [1.0, 0.1])
+@pytest.mark.parametrize('ngram', [
+    ('pona',), ('mi', 'pona'), ('mi', 'pona', 'a'), ('e', 'kili', '</s>'),
+    ('<s>', 'mi'), ('pona', 'mi'), ('mi', 'jan'), ('mi', 'moku', 'e', 'kili', '</s>'),
+])
+def test_log_score(order: int, gamma: float, ngram: tuple[str, ...]):
+    model = NgramModel.train(iter(sentences), order, gamma)
+    vocabulary_size = len({word for s in sentences for word in pad(s, order)}) + 1
+    assert len(model.vocabulary) == vocabulary_size
+
+    if len(ngram) > order:
+        expected = 1 / vocabulary_size
+    else:
+        expected = ((count(ngram, order) + gamma) /
+                    (context_total(ngram[:-1], order) + gamma * vocabulary_size))
+    ids = [model.word_ids.get(word, 0) for word in ngram]
+    assert model.log_score(ids) == pytest.approx(log2(expected))
+
+
+def test_entropies():
+    model = NgramModel.train(sentences, 3)
+    test_sentences = [['mi', 'pona'], ['mi', 'pona'], ['tau', 'popolam'], []]
+    assert model.entropies(test_sentences) == [
+        model.entropy(sentence) for sentence in test_sentences]
+    assert model.entropy(['mi', 'pona']) < model.entropy(['tau', 'popolam'])
@@ -2,7 +2,7 @@ from itertools import chain, product
 
 import pytest
 
-from palindrome import PalindromeGenerator
+from palindrome import PalindromeGenerator, Checkpoint, Constraints
 from words import pu_words
 
 small_word_list = ['a', 'ala', 'alasa', 'kala', 'la', 'pu']
@@ -39,3 +39,133 @@ def test_case_insensitiveness():
 
 def test_max_count_zero():
     assert not PalindromeGenerator(pu_words).generate(0)
+
+
+def satisfies(palindrome: str, constraints: Constraints) -> bool:
+    words = tuple(palindrome.split(' '))
+    return (all(word in words for word in constraints.required_words)
+            and not any(word in words for word in constraints.forbidden_words)
+            and words[:len(constraints.prefix)] == constraints.prefix
+            and (not constraints.suffix
+                 or words[-len(constraints.suffix):] == constraints.suffix)
+            and (constraints.max_length is None
+                 or len(palindrome) <= constraints.max_length))
+
+
+@pytest.mark.parametrize('word_list, max_word_count, constraints', [
+    (small_word_list, 8, Constraints(required_words=('kala',))),
+    (small_word_list, 8, Constraints(required_words=('kala', 'alasa'))),
+    (small_word_list, 8, Constraints(forbidden_words=('a', 'la'))),
+    (small_word_list, 8, Constraints(prefix=('ala', 'la'))),
+    (small_word_list, 8, Constraints(suffix=('la',), max_length=20)),
+    (small_word_list, 8, Constraints(max_length=12)),
+    (pu_words, 4, Constraints(required_words=('sina',), forbidden_words=('a',))),
+    (pu_words, 4, Constraints(prefix=('ni',), suffix=('kin',))),
+])
+def test_constraints(
+        word_list: list[str], max_word_count: int, constraints: Constraints):
+    generator = PalindromeGenerator(word_list)
+    expected = [
+        palindrome for palindrome in generator.generate(max_word_count)
+        if satisfies(palindrome, constraints)
+    ]
+    actual = generator.generate(max_word_count, constraints)
+    assert expected
+    assert sorted(actual) == sorted(expected)
+
+
+@pytest.mark.parametrize('old_word_list, new_words, max_word_count', [
+    (['a', 'ala', 'la', 'pu'], ['alasa', 'kala'], 8),
+    (pu_words, ['kipisi', 'meso'], 5),
+    (pu_words, ['ku', 'n', 'soko'], 3),
+])
+def test_generate_new(
+        old_word_list: list[str], new_words: list[str], max_word_count: int):
+    old = set(PalindromeGenerator(old_word_list).generate(max_word_count))
+    generator = PalindromeGenerator(old_word_list + new_words)
+    expected = [
+        palindrome for palindrome in generator.generate(max_word_count)
+        if palindrome not in old
+    ]
+    actual = generator.generate_new(max_word_count, new_words)
+    assert expected
+    assert sorted(actual) == sorted(expected)
+
+
+def test_resume_from_checkpoint(tmp_path):
+    generator = PalindromeGenerator(small_word_list)
+    expected = generator.generate(8)
+
+    checkpoint_file_name = str(tmp_path / 'checkpoint.json')
+    checkpoint = Checkpoint({})
+    actual = []
+    batches = generator.generate_resumable(8, checkpoint, step_count=10)
+    for _ in range(20):
+        actual.extend(next(batches))
+    checkpoint.save(checkpoint_file_name)
+    batches.close()
+
+    checkpoint = Checkpoint.load(checkpoint_file_name)
+    assert checkpoint.stacks
+    for palindromes in generator.generate_resumable(8, checkpoint, step_count=10):
+        actual.extend(palindromes)
+
+    assert sorted(actual) == sorted(expected)
+
+
+def test_anytime_complete():
+    generator = PalindromeGenerator(small_word_list)
+    fractions = []
+    result = generator.generate_anytime(
+        8, on_progress=lambda progress: fractions.append(progress.fraction))
+    assert result.complete
+    assert sorted(result.palindromes) == sorted(generator.generate(8))
+    assert fractions == sorted(fractions)
+    assert fractions[-1] == 1.0
+    assert result.progress.done_work == result.progress.total_work
+
+
+def test_anytime_max_results():
+    generator = PalindromeGenerator(pu_words)
+    result = generator.generate_anytime(6, max_results=10)
+    assert not result.complete
+    assert len(result.palindromes) == 10
+    assert set(result.palindromes) <= set(generator.generate(6))
+
+
+def test_anytime_deadline():
+    result = PalindromeGenerator(pu_words).generate_anytime(12, deadline=0.5)
+    assert not result.complete
+    assert result.progress.fraction < 1.0
+
+
+@pytest.mark.parametrize('word_list, max_word_count', [
+    (pu_words, 3),
+    (small_word_list, 8),
+])
+def test_vectorized_engine(word_list: list[str], max_word_count: int):
+    expected = generate_palindromes_naïvely(word_list, max_word_count)
+    actual = PalindromeGenerator(word_list).generate_vectorized(max_word_count)
+    assert sorted(actual) == sorted(expected)
+
+
+@pytest.mark.parametrize('constraints', [
+    Constraints(required_words=('kala', 'alasa')),
+    Constraints(forbidden_words=('a',), prefix=('ala', 'la'), max_length=25),
+    Constraints(any_of_words=('alasa', 'kala')),
+])
+def test_vectorized_engine_constraints(constraints: Constraints):
+    generator = PalindromeGenerator(small_word_list)
+    expected = generator.generate(8, constraints)
+    actual = generator.generate_vectorized(8, constraints)
+    assert sorted(actual) == sorted(expected)
+
+
+def test_vectorized_engine_chunks():
+    from palindrome.vectorized import CsrGraph, generate_vectorized
+
+    generator = PalindromeGenerator(small_word_list)
+    graph = CsrGraph(generator.graph.start_edges, generator.graph.edges_from_node,
+                     generator.graph.distances)
+    actual = generate_vectorized(graph, 8, chunk_size=3)
+    assert sorted(actual) == sorted(generator.generate(8))
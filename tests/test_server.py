@@ -0,0 +1,179 @@
+import asyncio
+import json
+import socket
+import threading
+from contextlib import contextmanager
+from http.client import HTTPConnection
+from typing import AsyncIterator, Iterator
+
+import pytest
+
+from palindrome import PalindromeGenerator, Constraints
+from server import PalindromeServer
+from sorting import get_sort_key
+from words import pu_words
+
+
+@contextmanager
+def run_server() -> Iterator[int]:
+    """ Runs a server on a background thread and yields its port.
+    """
+    loop = asyncio.new_event_loop()
+    palindrome_server = PalindromeServer(max_workers=2)
+    server = loop.run_until_complete(palindrome_server.start('127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    try:
+        yield server.sockets[0].getsockname()[1]
+    finally:
+        loop.call_soon_threadsafe(server.close)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        # connections still being closed
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+        palindrome_server.close()
+
+
+@pytest.fixture(scope='module')
+def port() -> Iterator[int]:
+    with run_server() as port:
+        yield port
+
+
+def request(port: int, method: str, url: str, body=None) -> tuple[int, bytes]:
+    connection = HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    connection.request(method, url, json.dumps(body) if body is not None else None,
+                       headers)
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, data
+
+
+def read_until_closed(port: int, data: bytes) -> bytes:
+    """ Sends raw `data` and reads the response until the server
+        closes the connection, unlike `HTTPConnection`,
+        which stops at the end of the response.
+    """
+    with socket.create_connection(('127.0.0.1', port), timeout=10) as client:
+        client.sendall(data)
+        response = b''
+        while chunk := client.recv(65536):
+            response += chunk
+        return response
+
+
+def generate(port: int, query: str) -> tuple[list[str], dict]:
+    status, data = request(port, 'GET', f'/generate?{query}')
+    assert status == 200
+    *batches, summary = (json.loads(line) for line in data.decode().splitlines())
+    palindromes = [p for batch in batches for p in batch['palindromes']]
+    assert summary['count'] == len(palindromes)
+    return palindromes, summary
+
+
+def test_generate(port: int):
+    palindromes, summary = generate(port, 'max_word_count=4&words=pu')
+    assert summary['complete']
+    assert sorted(palindromes) == sorted(PalindromeGenerator(pu_words).generate(4))
+
+
+def test_generate_with_constraints(port: int):
+    palindromes, summary = generate(
+        port, 'max_word_count=5&contains=kala&exclude=a&max_length=30')
+    constraints = Constraints(required_words=('kala',), forbidden_words=('a',),
+                              max_length=30)
+    expected = PalindromeGenerator(pu_words).generate(5, constraints)
+    assert summary['complete']
+    assert sorted(palindromes) == sorted(expected)
+
+
+def test_generate_only_new(port: int):
+    palindromes, summary = generate(
+        port, 'max_word_count=4&add=meso&add=kipisi&only_new=1')
+    expected = PalindromeGenerator(pu_words + ['meso', 'kipisi']).generate_new(
+        4, ['meso', 'kipisi'])
+    assert summary['complete']
+    assert sorted(palindromes) == sorted(expected)
+
+
+def test_generate_deadline(port: int):
+    palindromes, summary = generate(port, 'max_word_count=12&deadline=0.5')
+    assert not summary['complete']
+
+
+def test_grammar_filter(port: int):
+    status, data = request(port, 'POST', '/grammar-filter',
+                           {'sentences': ['mi pona', 'pona mi li']})
+    assert status == 200
+    assert json.loads(data) == {'sentences': ['mi pona']}
+
+
+@pytest.mark.parametrize('criterion', ['a', 'l', 'w', 'lm'])
+def test_sort(port: int, criterion: str):
+    sentences = ['toki pona li pona', 'a', 'mi pona', 'pona']
+    expected = sorted(sentences, key=get_sort_key(criterion))
+    status, data = request(port, 'POST', f'/sort?criterion={criterion}',
+                           {'sentences': sentences})
+    assert status == 200
+    assert json.loads(data) == {'sentences': expected}
+
+
+@pytest.mark.parametrize('method, url, status', [
+    ('GET', '/unknown', 404),
+    ('POST', '/generate', 405),
+    ('GET', '/generate', 400),
+    ('GET', '/generate?max_word_count=3&words=unknown', 400),
+    ('POST', '/sort?criterion=unknown', 400),
+])
+def test_errors(port: int, method: str, url: str, status: int):
+    actual_status, _ = request(port, method, url,
+                               {'sentences': []} if method == 'POST' else None)
+    assert actual_status == status
+
+
+def test_internal_error(port: int, monkeypatch: pytest.MonkeyPatch):
+    async def fail(self, sentences: list[str]) -> list[str]:
+        raise RuntimeError('failure')
+
+    monkeypatch.setattr(PalindromeServer, 'grammar_filter', fail)
+    status, data = request(port, 'POST', '/grammar-filter', {'sentences': []})
+    assert status == 500
+    assert json.loads(data) == {'error': 'failure'}
+
+
+def test_generate_error(port: int, monkeypatch: pytest.MonkeyPatch):
+    async def fail(self, *args) -> AsyncIterator[list[str]]:
+        yield ['a']
+        raise RuntimeError('failure')
+
+    monkeypatch.setattr(PalindromeServer, 'generate', fail)
+    palindromes, summary = generate(port, 'max_word_count=3')
+    assert palindromes == ['a']
+    assert summary == {'complete': False, 'error': 'failure', 'count': 1}
+
+
+def test_connection_closed_after_first_request():
+    # The first request starts the workers, which must not keep
+    # the connection open
+    with run_server() as port:
+        response = read_until_closed(
+            port, b'GET /generate?max_word_count=2 HTTP/1.1\r\n\r\n')
+        assert response.startswith(b'HTTP/1.1 200 OK')
+        assert response.endswith(b'0\r\n\r\n')
+
+
+@pytest.mark.parametrize('data', [
+    b'GARBAGE\r\n\r\n',
+    b'POST /sort HTTP/1.1\r\nContent-Length: abc\r\n\r\n',
+])
+def test_connection_closed_after_bad_request(port: int, data: bytes):
+    response = read_until_closed(port, data)
+    assert response.startswith(b'HTTP/1.1 400 Bad Request')
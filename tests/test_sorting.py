@@ -0,0 +1,18 @@
+import pytest
+
+from grammar import grammar_filter
+from palindrome import PalindromeGenerator
+from sorting import get_sort_key, sort_by_score
+from words import pu_words
+
+
+@pytest.mark.parametrize('max_word_count', [2, 4])
+@pytest.mark.parametrize('check_grammar', [False, True])
+def test_sort_by_score(max_word_count: int, check_grammar: bool):
+    palindromes = PalindromeGenerator(pu_words).generate(max_word_count)
+    expected = grammar_filter(palindromes) if check_grammar else palindromes
+    expected = sorted(expected, key=get_sort_key('lm'))
+
+    scored = sort_by_score(palindromes, check_grammar)
+    assert [palindrome for _, palindrome in scored] == expected
+    assert [score for score, _ in scored] == sorted(score for score, _ in scored)
@@ -0,0 +1,54 @@
+import pytest
+
+from palindrome import PalindromeGenerator
+from tpal import TpalReader, write_tpal
+from words import pu_words
+
+
+@pytest.fixture
+def palindromes() -> list[str]:
+    return PalindromeGenerator(pu_words + ['Pingo']).generate(4)
+
+
+def test_round_trip(tmp_path, palindromes: list[str]):
+    file_name = str(tmp_path / 'results.tpal')
+    write_tpal(file_name, palindromes, word_list=pu_words)
+
+    with TpalReader(file_name) as reader:
+        assert len(reader) == len(palindromes)
+        assert list(reader) == palindromes
+        assert reader[0] == palindromes[0]
+        assert reader[-1] == palindromes[-1]
+        assert reader[10:20] == palindromes[10:20]
+        assert reader[::-7] == palindromes[::-7]
+        assert reader.get_score(0) is None
+        with pytest.raises(IndexError):
+            reader[len(palindromes)]
+
+
+def test_scores(tmp_path, palindromes: list[str]):
+    file_name = str(tmp_path / 'results.tpal')
+    scores = [len(palindrome) / 3 for palindrome in palindromes]
+    write_tpal(file_name, palindromes, scores)
+
+    with TpalReader(file_name) as reader:
+        assert [reader.get_score(i) for i in range(len(reader))] == scores
+
+
+def test_to_text(tmp_path, palindromes: list[str]):
+    file_name = str(tmp_path / 'results.tpal')
+    text_file_name = tmp_path / 'results.txt'
+    write_tpal(file_name, palindromes)
+
+    with TpalReader(file_name) as reader:
+        reader.to_text(str(text_file_name))
+    assert text_file_name.read_text(encoding='utf-8').splitlines() == palindromes
+
+
+def test_empty(tmp_path):
+    file_name = str(tmp_path / 'results.tpal')
+    write_tpal(file_name, [])
+
+    with TpalReader(file_name) as reader:
+        assert len(reader) == 0
+        assert list(reader) == []
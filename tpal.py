@@ -0,0 +1,182 @@
+""" Compact indexed binary format for palindrome lists (`.tpal`).
+
+    Palindromes are stored as sequences of word ids
+    referring to the embedded word table. The file can be memory-mapped
+    and gives random access to the records.
+
+    Layout (little-endian, sections are aligned to 8 bytes):
+    * header: magic `TPAL`, version (u16), word id size in bytes (u16),
+      record count, word count, and offsets of the sections (u64 each)
+    * data: word ids of all the records one after another
+    * index: `record count + 1` offsets (u64) of the records in the data
+      measured in word ids
+    * scores: a score (f64) for every record, present if the scores offset
+      is not 0
+    * word table: words as UTF-8 separated with newlines
+"""
+from __future__ import annotations
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import Iterable, Iterator, Optional, overload
+
+MAGIC = b'TPAL'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQQQQQ')
+EXTENSION = '.tpal'
+
+
+def is_tpal_file_name(file_name: str) -> bool:
+    return file_name.lower().endswith(EXTENSION)
+
+
+def write_tpal(
+        file_name: str,
+        palindromes: Iterable[str],
+        scores: Optional[Iterable[float]] = None,
+        word_list: Optional[list[str]] = None):
+    """ Writes palindromes to a `.tpal` file.
+        `scores`, if given, should contain a score for every palindrome.
+        Words missing from `word_list` are added to the word table
+        in order of appearance.
+    """
+    word_ids = {word: i for i, word in enumerate(dict.fromkeys(word_list or []))}
+    id_format = 'H' if len(word_ids) < 1 << 16 else 'I'
+
+    with open(file_name, 'wb') as file:
+        file.write(bytes(HEADER.size))
+        data_offset = file.tell()
+
+        offsets = array('Q', [0])
+        record: array = array(id_format)
+        for palindrome in palindromes:
+            record = array(id_format)
+            for word in palindrome.split(' '):
+                word_id = word_ids.setdefault(word, len(word_ids))
+                if word_id >= 1 << 16 and id_format == 'H':
+                    raise ValueError('too many words for 16-bit word ids')
+                record.append(word_id)
+            file.write(record.tobytes())
+            offsets.append(offsets[-1] + len(record))
+
+        index_offset = align(file)
+        file.write(offsets.tobytes())
+
+        scores_offset = 0
+        if scores is not None:
+            score_array = array('d', scores)
+            if len(score_array) != len(offsets) - 1:
+                raise ValueError('score count does not match palindrome count')
+            scores_offset = align(file)
+            file.write(score_array.tobytes())
+
+        words_offset = file.tell()
+        file.write('\n'.join(word_ids).encode('utf-8'))
+
+        file.seek(0)
+        file.write(HEADER.pack(
+            MAGIC, VERSION, record.itemsize, len(offsets) - 1, len(word_ids),
+            data_offset, index_offset, scores_offset, words_offset))
+
+
+def align(file) -> int:
+    """ Pads the file to 8 bytes and returns the position.
+    """
+    position = file.tell()
+    padding = -position % 8
+    file.write(bytes(padding))
+    return position + padding
+
+
+class TpalReader:
+    """ Memory-mapped reader of a `.tpal` file.
+        Supports `len`, indexing, slicing, and iteration,
+        which give palindromes as strings.
+    """
+
+    def __init__(self, file_name: str):
+        with open(file_name, 'rb') as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, id_size, record_count, word_count,
+         data_offset, index_offset, scores_offset, words_offset
+         ) = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC or version != VERSION:
+            self.mmap.close()
+            raise ValueError(f'not a {EXTENSION} file: {file_name}')
+
+        buffer = memoryview(self.mmap)
+        id_format = 'H' if id_size == 2 else 'I'
+        self.data = buffer[data_offset:index_offset].cast('B').cast(id_format)
+        self.offsets = buffer[index_offset:index_offset + 8 * (record_count + 1)].cast('Q')
+        self.scores: Optional[memoryview] = (
+            buffer[scores_offset:scores_offset + 8 * record_count].cast('d')
+            if scores_offset else None
+        )
+        word_table = bytes(buffer[words_offset:]).decode('utf-8')
+        self.words = word_table.split('\n') if word_count else []
+
+    def close(self):
+        for view in (self.data, self.offsets, self.scores):
+            if view is not None:
+                view.release()
+        self.mmap.close()
+
+    def __enter__(self) -> TpalReader:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.get(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('record index out of range')
+        return self.get(index)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.get(i) for i in range(len(self)))
+
+    def get(self, index: int) -> str:
+        return ' '.join(self.get_words(index))
+
+    def get_words(self, index: int) -> list[str]:
+        words = self.words
+        return [words[word_id]
+                for word_id in self.data[self.offsets[index]:self.offsets[index + 1]]]
+
+    def get_score(self, index: int) -> Optional[float]:
+        return None if self.scores is None else self.scores[index]
+
+    def to_text(self, file_name: str):
+        """ Writes the palindromes to a text file, one per line.
+        """
+        with open(file_name, 'w', encoding='utf-8') as file:
+            for palindrome in self:
+                file.write(f'{palindrome}\n')
+
+
+def main():
+    with TpalReader(sys.argv[1]) as reader:
+        start = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        stop = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        for palindrome in reader[start:stop]:
+            print(palindrome)
+
+
+if __name__ == '__main__':
+    main()
@@ -196,3 +196,15 @@ ku_lili_words = [
     'kalamARR'
     # 'misa suli',
 ]
+
+
+def get_word_list(value: str) -> list[str]:
+    match value:
+        case 'p' | 'pu':
+            return pu_words
+        case 's' | 'ku-suli':
+            return pu_words + ku_suli_words
+        case 'l' | 'ku-lili':
+            return pu_words + ku_suli_words + ku_lili_words
+        case _:
+            raise ValueError(f'invalid word list')